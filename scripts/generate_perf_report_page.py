@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, cast
 
 from jinja2 import Template
+from perf_fingerprint import grouping_fingerprint, matches_fingerprint, parse_fingerprint_filter
 
 # skip 'input' columns. They are included in the header and just blow the table
 EXCLUDE_COLUMNS = frozenset(
@@ -43,6 +44,7 @@ class SuitRun:
 @dataclass
 class SuitRuns:
     platform: str
+    fingerprint: Dict[str, Any]
     suit: str
     common_columns: List[Tuple[str, str]]
     value_columns: List[str]
@@ -156,16 +158,27 @@ def prepare_rows_from_runs(value_columns: List[str], runs: List[SuitRun]) -> Lis
 
 def main(args: argparse.Namespace) -> None:
     input_dir = Path(args.input_dir)
+    fingerprint_filter = parse_fingerprint_filter(args.fingerprint)
     grouped_runs: Dict[str, SuitRuns] = {}
     # we have files in form: <ctr>_<rev>.json
     # fill them in the hashmap so we have grouped items for the
     # same run configuration (scale, duration etc.) ordered by counter.
+    # Runs on different hardware or builds are never compared with each other,
+    # so the stable part of the environment fingerprint is a part of the key.
     for item in sorted(input_dir.iterdir(), key=lambda x: int(x.name.split("_")[0])):
         run_data = json.loads(item.read_text())
         revision = run_data["revision"]
+        # results from before the fingerprint was introduced don't have it
+        fingerprint = run_data.get("fingerprint", {})
+        if not matches_fingerprint(fingerprint, fingerprint_filter):
+            continue
 
         for suit_result in run_data["result"]:
-            key = "{}{}".format(run_data["platform"], suit_result["suit"])
+            key = "{}{}{}".format(
+                run_data["platform"],
+                json.dumps(grouping_fingerprint(fingerprint), sort_keys=True),
+                suit_result["suit"],
+            )
             # pack total duration as a synthetic value
             total_duration = suit_result["total_duration"]
             suit_result["data"].append(
@@ -182,6 +195,7 @@ def main(args: argparse.Namespace) -> None:
                 key,
                 SuitRuns(
                     platform=run_data["platform"],
+                    fingerprint=grouping_fingerprint(fingerprint),
                     suit=suit_result["suit"],
                     common_columns=common_columns,
                     value_columns=value_columns,
@@ -191,12 +205,13 @@ def main(args: argparse.Namespace) -> None:
 
             grouped_runs[key].runs.append(SuitRun(revision=revision, values=suit_result))
     context = {}
-    for result in grouped_runs.values():
-        suit = result.suit
-        context[suit] = {
+    for key, result in grouped_runs.items():
+        context[key] = {
+            "suit": result.suit,
             "common_columns": result.common_columns,
             "value_columns": result.value_columns,
             "platform": result.platform,
+            "fingerprint": sorted(result.fingerprint.items()),
             # reverse the order so newest results are on top of the table
             "rows": reversed(prepare_rows_from_runs(result.value_columns, result.runs)),
         }
@@ -215,5 +230,12 @@ if __name__ == "__main__":
         help="Directory with jsons generated by the test suite",
     )
     parser.add_argument("--out", required=True, help="Output html file path")
+    parser.add_argument(
+        "--fingerprint",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Only include runs with a matching environment fingerprint, e.g. build_type=release",
+    )
     args = parser.parse_args()
     main(args)
@@ -6,9 +6,11 @@ import sys
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Dict
 
 import psycopg2
 import psycopg2.extras
+from perf_fingerprint import matches_fingerprint, parse_fingerprint_filter
 
 CREATE_TABLE = """
 CREATE TABLE IF NOT EXISTS perf_test_results (
@@ -20,8 +22,19 @@ CREATE TABLE IF NOT EXISTS perf_test_results (
     metric_value NUMERIC,
     metric_unit VARCHAR(10),
     metric_report_type TEXT,
-    recorded_at_timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-)
+    recorded_at_timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    fingerprint JSONB,
+    metric_tags JSONB
+);
+"""
+
+# Brings a table created by an older version of this script up to date. Runs on
+# every invocation, as CI ingests into the existing table without --initdb.
+MIGRATE_TABLE = """
+ALTER TABLE perf_test_results ADD COLUMN IF NOT EXISTS fingerprint JSONB;
+CREATE INDEX IF NOT EXISTS perf_test_results_fingerprint_idx
+    ON perf_test_results USING GIN (fingerprint);
+ALTER TABLE perf_test_results ADD COLUMN IF NOT EXISTS metric_tags JSONB;
 """
 
 
@@ -44,10 +57,20 @@ def create_table(cur):
     cur.execute(CREATE_TABLE)
 
 
-def ingest_perf_test_result(cursor, data_file: Path, recorded_at_timestamp: int) -> int:
+def migrate_table(cur):
+    cur.execute(MIGRATE_TABLE)
+
+
+def ingest_perf_test_result(
+    cursor, data_file: Path, recorded_at_timestamp: int, fingerprint_filter: Dict[str, str]
+) -> int:
     run_data = json.loads(data_file.read_text())
     revision = run_data["revision"]
     platform = run_data["platform"]
+    # results from before the fingerprint was introduced don't have it
+    fingerprint = run_data.get("fingerprint", {})
+    if not matches_fingerprint(fingerprint, fingerprint_filter):
+        return 0
 
     run_result = run_data["result"]
     args_list = []
@@ -75,6 +98,9 @@ def ingest_perf_test_result(cursor, data_file: Path, recorded_at_timestamp: int)
                 "metric_unit": metric["unit"],
                 "metric_report_type": metric["report"],
                 "recorded_at_timestamp": datetime.utcfromtimestamp(recorded_at_timestamp),
+                "fingerprint": json.dumps(fingerprint),
+                # e.g. the tenant config of a neon_config_matrix run
+                "metric_tags": json.dumps(metric.get("tags", {})),
             }
             args_list.append(values)
 
@@ -89,7 +115,9 @@ def ingest_perf_test_result(cursor, data_file: Path, recorded_at_timestamp: int)
             metric_value,
             metric_unit,
             metric_report_type,
-            recorded_at_timestamp
+            recorded_at_timestamp,
+            fingerprint,
+            metric_tags
         ) VALUES %s
         """,
         args_list,
@@ -101,7 +129,9 @@ def ingest_perf_test_result(cursor, data_file: Path, recorded_at_timestamp: int)
             %(metric_value)s,
             %(metric_unit)s,
             %(metric_report_type)s,
-            %(recorded_at_timestamp)s
+            %(recorded_at_timestamp)s,
+            %(fingerprint)s,
+            %(metric_tags)s
         )""",
     )
     return len(args_list)
@@ -118,11 +148,23 @@ def main():
         help="Path to perf test result file, or directory with perf test result files",
     )
     parser.add_argument("--initdb", action="store_true", help="Initialuze database")
+    parser.add_argument(
+        "--fingerprint",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Only ingest results with a matching environment fingerprint, e.g. build_type=release",
+    )
 
     args = parser.parse_args()
+    try:
+        fingerprint_filter = parse_fingerprint_filter(args.fingerprint)
+    except ValueError as e:
+        err(str(e))
     with get_connection_cursor() as cur:
         if args.initdb:
             create_table(cur)
+        migrate_table(cur)
 
         if not args.ingest.exists():
             err(f"ingest path {args.ingest} does not exist")
@@ -131,11 +173,15 @@ def main():
             if args.ingest.is_dir():
                 for item in sorted(args.ingest.iterdir(), key=lambda x: int(x.name.split("_")[0])):
                     recorded_at_timestamp = int(item.name.split("_")[0])
-                    ingested = ingest_perf_test_result(cur, item, recorded_at_timestamp)
+                    ingested = ingest_perf_test_result(
+                        cur, item, recorded_at_timestamp, fingerprint_filter
+                    )
                     print(f"Ingested {ingested} metric values from {item}")
             else:
                 recorded_at_timestamp = int(args.ingest.name.split("_")[0])
-                ingested = ingest_perf_test_result(cur, args.ingest, recorded_at_timestamp)
+                ingested = ingest_perf_test_result(
+                    cur, args.ingest, recorded_at_timestamp, fingerprint_filter
+                )
                 print(f"Ingested {ingested} metric values from {args.ingest}")
 
 
@@ -0,0 +1,41 @@
+from typing import Any, Dict, List
+
+"""
+Helpers for the environment fingerprint of the perf test results, shared by
+ingest_perf_test_result.py and generate_perf_report_page.py. The fingerprint is
+written by get_environment_fingerprint in test_runner/fixtures/benchmark_fixture.py.
+"""
+
+
+def parse_fingerprint_filter(items: List[str]) -> Dict[str, str]:
+    """Parse KEY=VALUE filters, raise ValueError if one is malformed"""
+    fingerprint_filter = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"invalid fingerprint filter {item!r}, expected KEY=VALUE")
+        fingerprint_filter[key] = value
+    return fingerprint_filter
+
+
+def matches_fingerprint(fingerprint: Dict[str, Any], fingerprint_filter: Dict[str, str]) -> bool:
+    # values are compared as strings, so that e.g. pg_version=14 matches both "14" and 14,
+    # lists (like pageserver_features) match if they contain the value
+    for key, expected in fingerprint_filter.items():
+        actual = fingerprint.get(key)
+        if isinstance(actual, list):
+            if expected not in map(str, actual):
+                return False
+        elif str(actual) != expected:
+            return False
+    return True
+
+
+# The part of the fingerprint that results are grouped by in the report. The rest,
+# like the kernel or the amount of memory, changes with updates of the CI runners,
+# which shouldn't start a new history every time.
+GROUPING_FINGERPRINT_KEYS = ("cpu_model", "build_type", "pageserver_features", "pg_version")
+
+
+def grouping_fingerprint(fingerprint: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: fingerprint[key] for key in GROUPING_FINGERPRINT_KEYS if key in fingerprint}
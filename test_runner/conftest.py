@@ -2,6 +2,8 @@ pytest_plugins = (
     "fixtures.neon_fixtures",
     "fixtures.benchmark_fixture",
     "fixtures.pg_stats",
+    "fixtures.resource_sampler",
+    "fixtures.metrics_scraper",
     "fixtures.compare_fixtures",
     "fixtures.slow",
 )
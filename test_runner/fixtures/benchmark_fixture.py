@@ -1,24 +1,64 @@
+import bisect
 import calendar
+import collections
 import dataclasses
 import enum
+import functools
+import itertools
 import json
+import math
 import os
+import random
 import re
+import statistics
+import subprocess
+import threading
 import timeit
 import warnings
+from collections import defaultdict
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
 # Type-related stuff
-from typing import Callable, ClassVar, Iterator, Optional
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Counter,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
+import psutil
 import pytest
 from _pytest.config import Config
 from _pytest.config.argparsing import Parser
+from _pytest.fixtures import FixtureRequest
 from _pytest.terminal import TerminalReporter
-from fixtures.neon_fixtures import NeonPageserver
+from fixtures.log_helper import log
+from fixtures.metrics import PAGESERVER_PER_TENANT_METRICS, Histogram, parse_metrics
+from fixtures.neon_fixtures import (
+    DEFAULT_OUTPUT_DIR,
+    DEFAULT_PG_VERSION_DEFAULT,
+    NeonPageserver,
+    PageserverHttpClient,
+)
 from fixtures.types import TenantId, TimelineId
+from fixtures.utils import (
+    LayerFile,
+    LayerMapModel,
+    TimelineLayers,
+    get_dir_size,
+    get_self_dir,
+)
 
 """
 This file contains fixtures for micro-benchmarks.
@@ -47,6 +87,80 @@ in the test initialization, or measure disk usage after the test query.
 """
 
 
+@dataclasses.dataclass
+class PgBenchProgressInterval:
+    # end of the interval; a unix timestamp with --progress-timestamp,
+    # seconds since the start of the run otherwise
+    timestamp: float
+    tps: float
+    # latencies are in ms, and NaN for intervals without any transactions
+    latency_average: float
+    latency_stddev: float
+
+    # progress: 1670334155.123 s, 1270.6 tps, lat 3.147 ms stddev 1.220
+    # (newer versions may append ", lag ... ms", ", N failed" etc., which we ignore)
+    REGEX: ClassVar[re.Pattern] = re.compile(  # type: ignore[type-arg]
+        r"^progress: (\d+(?:\.\d+)?) s, (\d+(?:\.\d+)?) tps, lat ([^\s,]+) ms stddev ([^\s,]+)"
+    )
+
+    @classmethod
+    def parse_from_stderr(cls, stderr: str) -> List["PgBenchProgressInterval"]:
+        """Parse `pgbench -P` progress reports, which pgbench prints to stderr"""
+        progress = []
+        for line in stderr.splitlines():
+            if (m := cls.REGEX.match(line)) is not None:
+                timestamp, tps, latency_average, latency_stddev = m.groups()
+                progress.append(
+                    cls(
+                        timestamp=float(timestamp),
+                        tps=float(tps),
+                        latency_average=float(latency_average),
+                        latency_stddev=float(latency_stddev),
+                    )
+                )
+        return progress
+
+
+@dataclasses.dataclass
+class PgBenchProgressStats:
+    """Throughput stability metrics derived from the pgbench progress series"""
+
+    # lowest throughput of a single progress interval
+    min_interval_tps: float
+    # coefficient of variation (stddev / mean) of per-interval tps
+    tps_cv: float
+    # longest continuous time (s) with throughput below `stall_threshold` of the median
+    longest_stall: float
+
+    @classmethod
+    def from_progress(
+        cls, progress: List[PgBenchProgressInterval], stall_threshold: float = 0.1
+    ) -> Optional["PgBenchProgressStats"]:
+        if len(progress) < 2:
+            return None
+
+        tps = [interval.tps for interval in progress]
+        mean_tps = statistics.mean(tps)
+        tps_cv = statistics.pstdev(tps) / mean_tps if mean_tps > 0 else 0.0
+
+        # the first interval has no predecessor, assume it was as long as a typical one
+        timestamps = [interval.timestamp for interval in progress]
+        durations = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        durations.insert(0, statistics.median(durations))
+
+        stall_tps = statistics.median(tps) * stall_threshold
+        longest_stall = 0.0
+        current_stall = 0.0
+        for interval_tps, duration in zip(tps, durations):
+            if interval_tps <= stall_tps:
+                current_stall += duration
+                longest_stall = max(longest_stall, current_stall)
+            else:
+                current_stall = 0.0
+
+        return cls(min_interval_tps=min(tps), tps_cv=tps_cv, longest_stall=longest_stall)
+
+
 @dataclasses.dataclass
 class PgBenchRunResult:
     number_of_clients: int
@@ -59,8 +173,8 @@ class PgBenchRunResult:
     run_start_timestamp: int
     run_end_timestamp: int
     scale: int
-
-    # TODO progress
+    # per-interval throughput and latency, available if pgbench was run with -P
+    progress: List[PgBenchProgressInterval] = dataclasses.field(default_factory=list)
 
     @classmethod
     def parse_from_stdout(
@@ -69,6 +183,7 @@ class PgBenchRunResult:
         run_duration: float,
         run_start_timestamp: int,
         run_end_timestamp: int,
+        stderr: Optional[str] = None,
     ):
         stdout_lines = stdout.splitlines()
 
@@ -130,6 +245,7 @@ class PgBenchRunResult:
             run_start_timestamp=run_start_timestamp,
             run_end_timestamp=run_end_timestamp,
             scale=scale,
+            progress=PgBenchProgressInterval.parse_from_stderr(stderr) if stderr else [],
         )
 
 
@@ -189,6 +305,119 @@ class PgBenchInitResult:
         )
 
 
+@dataclasses.dataclass
+class PgBenchTransactionLog:
+    """
+    Aggregated contents of the per-transaction logs written by `pgbench --log`.
+
+    Each log line looks like
+        client_id transaction_no time script_no time_epoch time_us
+    where `time` is the transaction latency in microseconds. Since the latencies
+    are integers, counting them gives exact quantiles in bounded memory, even for
+    logs with tens of millions of lines.
+    """
+
+    # latency (us) -> number of transactions
+    latencies: Counter[int] = dataclasses.field(default_factory=collections.Counter)
+    # unix timestamp (s) -> number of transactions finished during that second
+    per_second: Counter[int] = dataclasses.field(default_factory=collections.Counter)
+    # client id -> number of transactions
+    per_client: Counter[int] = dataclasses.field(default_factory=collections.Counter)
+
+    CHUNK_SIZE: ClassVar[int] = 64 * 1024 * 1024
+    FIELDS_PER_LINE: ClassVar[int] = 6
+
+    @classmethod
+    def parse_from_files(cls, paths: Iterable[Path]) -> "PgBenchTransactionLog":
+        result = cls()
+        for path in paths:
+            with open(path, "rb") as f:
+                remainder = b""
+                while chunk := f.read(cls.CHUNK_SIZE):
+                    chunk = remainder + chunk
+                    end = chunk.rfind(b"\n") + 1
+                    remainder = chunk[end:]
+                    result._ingest_chunk(chunk[:end])
+                if remainder:
+                    result._ingest_chunk(remainder + b"\n")
+        return result
+
+    def _ingest_chunk(self, chunk: bytes):
+        n = self.FIELDS_PER_LINE
+        tokens = chunk.split()
+        if len(tokens) == n * chunk.count(b"\n"):
+            # Fast path: all lines have the default format, so every column can be
+            # sliced out of the token list and counted without a Python-level loop.
+            try:
+                latencies = list(map(int, tokens[2::n]))
+                seconds = list(map(int, tokens[4::n]))
+                clients = list(map(int, tokens[0::n]))
+            except ValueError:
+                pass  # e.g. "failed" or "skipped" instead of latency
+            else:
+                self.latencies.update(latencies)
+                self.per_second.update(seconds)
+                self.per_client.update(clients)
+                return
+
+        # Slow path: lines with extra columns (--rate, --failures-detailed, ...)
+        # or failed/skipped transactions without latency.
+        for line in chunk.splitlines():
+            fields = line.split()
+            if len(fields) < n or not fields[2].isdigit():
+                continue
+            self.latencies[int(fields[2])] += 1
+            self.per_second[int(fields[4])] += 1
+            self.per_client[int(fields[0])] += 1
+
+    @property
+    def count(self) -> int:
+        return sum(self.latencies.values())
+
+    def latency_quantiles(self, quantiles: Iterable[float]) -> List[float]:
+        """Exact latency quantiles, in ms"""
+        count = self.count
+        assert count > 0, "no transactions in pgbench log"
+
+        result = []
+        values = sorted(self.latencies)
+        cumulative = list(itertools.accumulate(self.latencies[v] for v in values))
+        for q in quantiles:
+            rank = max(1, math.ceil(q * count))
+            result.append(values[bisect.bisect_left(cumulative, rank)] / 1000)
+        return result
+
+    def per_second_tps(self) -> List[int]:
+        """
+        Number of transactions in each second of the run, including seconds without
+        any. The first and the last seconds are partial, so they are left out.
+        """
+        if len(self.per_second) < 3:
+            return []
+        first, last = min(self.per_second), max(self.per_second)
+        return [self.per_second[sec] for sec in range(first + 1, last)]
+
+    def client_fairness(self) -> float:
+        """
+        Jain's fairness index of the number of transactions done by each client:
+        1.0 if all clients did the same amount of work, 1/n if one client did all.
+        """
+        counts = list(self.per_client.values())
+        assert counts, "no transactions in pgbench log"
+        return jain_fairness_index(counts)
+
+
+def jain_fairness_index(values: Sequence[float]) -> float:
+    """
+    Jain's fairness index of the amounts of work done by n participants:
+    1.0 if all did the same amount, 1/n if one did all of it.
+    """
+    square_sum = sum(v * v for v in values)
+    if square_sum == 0:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * square_sum)
+
+
 @enum.unique
 class MetricReport(str, enum.Enum):  # str is a hack to make it json serializable
     # this means that this is a constant test parameter
@@ -200,6 +429,360 @@ class MetricReport(str, enum.Enum):  # str is a hack to make it json serializabl
     LOWER_IS_BETTER = "lower_is_better"
 
 
+def quantile_suffix(q: float) -> str:
+    """Metric name suffix for a quantile: 0.5 -> p50, 0.999 -> p99_9, 1.0 -> max"""
+    if q == 1.0:
+        return "max"
+    return "p" + f"{q * 100:g}".replace(".", "_")
+
+
+class LatencyHistogram:
+    """
+    A log-bucketed (HDR-style) histogram of non-negative values, e.g. latencies.
+
+    Values are quantized to `resolution` (1us for values in seconds by default) and
+    put into buckets whose width grows with the magnitude of the value, so that the
+    relative error of any reported quantile stays below 2**-(significant_bits-1).
+    Only non-empty buckets are stored, so the histogram stays small even with
+    millions of samples.
+
+    Recording is thread-safe, and histograms with the same parameters can be
+    merged, so each worker thread can keep its own histogram and merge them in
+    the end.
+    """
+
+    QUANTILES: ClassVar[Tuple[float, ...]] = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, resolution: float = 1e-6, significant_bits: int = 7):
+        assert resolution > 0
+        assert significant_bits >= 2
+        self.resolution = resolution
+        self.significant_bits = significant_bits
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _bucket_index(self, value: float) -> int:
+        quantized = int(value / self.resolution)
+        shift = max(quantized.bit_length() - self.significant_bits, 0)
+        if shift == 0:
+            return quantized
+        half = 1 << (self.significant_bits - 1)
+        return shift * half + (quantized >> shift)
+
+    def _bucket_bounds(self, index: int) -> Tuple[float, float]:
+        """Return [lower, upper) bounds of the bucket, in the units of recorded values"""
+        if index < (1 << self.significant_bits):
+            lower, upper = index, index + 1
+        else:
+            half = 1 << (self.significant_bits - 1)
+            shift = (index >> (self.significant_bits - 1)) - 1
+            mantissa = index - shift * half
+            lower, upper = mantissa << shift, (mantissa + 1) << shift
+        return lower * self.resolution, upper * self.resolution
+
+    def record(self, value: float):
+        assert value >= 0, f"cannot record negative value {value}"
+        index = self._bucket_index(value)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    @contextmanager
+    def record_duration(self) -> Iterator[None]:
+        """Record the duration of the enclosed block, in seconds"""
+        start = timeit.default_timer()
+        yield
+        self.record(timeit.default_timer() - start)
+
+    def merge(self, other: "LatencyHistogram"):
+        assert (self.resolution, self.significant_bits) == (
+            other.resolution,
+            other.significant_bits,
+        ), "cannot merge histograms with different bucketing"
+        with other._lock:
+            buckets = dict(other.buckets)
+            count, total, lo, hi = other.count, other.sum, other.min, other.max
+        with self._lock:
+            for index, n in buckets.items():
+                self.buckets[index] += n
+            self.count += count
+            self.sum += total
+            if lo is not None:
+                self.min = lo if self.min is None else min(self.min, lo)
+            if hi is not None:
+                self.max = hi if self.max is None else max(self.max, hi)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-th quantile (0 <= q <= 1). Returns the midpoint of the bucket
+        that contains it, clamped to the exact observed min and max.
+        """
+        assert 0 <= q <= 1
+        assert self.count > 0, "cannot compute quantile of an empty histogram"
+        assert self.min is not None and self.max is not None
+
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                lower, upper = self._bucket_bounds(index)
+                return min(max((lower + upper) / 2, self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        assert self.count > 0, "cannot compute mean of an empty histogram"
+        return self.sum / self.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact json-serializable form, see `from_dict`"""
+        return {
+            "resolution": self.resolution,
+            "significant_bits": self.significant_bits,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            # flat [index, count, index, count, ...] list, sorted by index
+            "buckets": [x for index in sorted(self.buckets) for x in (index, self.buckets[index])],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        hist = cls(resolution=data["resolution"], significant_bits=data["significant_bits"])
+        flat = data["buckets"]
+        for index, n in zip(flat[::2], flat[1::2]):
+            hist.buckets[index] = n
+        hist.count = data["count"]
+        hist.sum = data["sum"]
+        hist.min = data["min"]
+        hist.max = data["max"]
+        return hist
+
+
+def bootstrap_median_ci(
+    samples: List[float], confidence: float = 0.95, resamples: int = 1000
+) -> Tuple[float, float]:
+    """Bootstrap confidence interval of the median of `samples`"""
+    if len(samples) < 2:
+        return samples[0], samples[0]
+
+    # fixed seed, so that the same samples always give the same interval
+    rng = random.Random(0)
+    medians = sorted(
+        statistics.median(rng.choices(samples, k=len(samples))) for _ in range(resamples)
+    )
+    alpha = (1 - confidence) / 2
+    low = medians[int(alpha * resamples)]
+    high = medians[min(resamples - 1, int((1 - alpha) * resamples))]
+    return low, high
+
+
+@functools.lru_cache(maxsize=None)
+def _mann_whitney_distribution(m: int, n: int) -> Tuple[int, ...]:
+    # number of orderings of m + n distinct values that give each U from 0 to m * n
+    if m == 0 or n == 0:
+        return (1,)
+    without_last_a = _mann_whitney_distribution(m - 1, n)
+    without_last_b = _mann_whitney_distribution(m, n - 1)
+    return tuple(
+        (without_last_a[u - n] if u >= n else 0)
+        + (without_last_b[u] if u < len(without_last_b) else 0)
+        for u in range(m * n + 1)
+    )
+
+
+def mann_whitney_u(a: List[float], b: List[float]) -> Tuple[float, float]:
+    """
+    Two-sided Mann-Whitney U test of `a` and `b` being samples of the same distribution.
+    Returns U of `a` and the p-value. The p-value is exact for small samples without
+    ties, otherwise the normal approximation with tie correction is used.
+    """
+    m, n = len(a), len(b)
+    if m == 0 or n == 0:
+        return 0.0, 1.0
+
+    values = sorted(a + b)
+    ranks: Dict[float, float] = {}
+    tie_term = 0
+    i = 0
+    while i < len(values):
+        j = i
+        while j < len(values) and values[j] == values[i]:
+            j += 1
+        # tied values get the average of ranks i + 1 ..= j
+        ranks[values[i]] = (i + j + 1) / 2
+        tie_term += (j - i) ** 3 - (j - i)
+        i = j
+    u = sum(ranks[v] for v in a) - m * (m + 1) / 2
+
+    if tie_term == 0 and m * n <= 400:
+        distribution = _mann_whitney_distribution(m, n)
+        tail = sum(distribution[: int(min(u, m * n - u)) + 1])
+        return u, min(1.0, 2 * tail / sum(distribution))
+
+    sigma = math.sqrt(m * n / 12 * ((m + n + 1) - tie_term / ((m + n) * (m + n - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = max(0.0, abs(u - m * n / 2) - 0.5) / sigma
+    return u, math.erfc(z / math.sqrt(2))
+
+
+def min_mann_whitney_p_value(m: int, n: int) -> float:
+    """The smallest p-value `mann_whitney_u` can give for samples of sizes m and n"""
+    return min(1.0, 2 / math.comb(m + n, m))
+
+
+@dataclasses.dataclass
+class BaselineComparison:
+    suit: str
+    name: str
+    unit: str
+    report: MetricReport
+    baseline: List[float]
+    current: List[float]
+    p_value: float
+
+    # changes smaller than this are not reported, even if they are significant
+    MIN_CHANGE: ClassVar[float] = 0.05
+    ALPHA: ClassVar[float] = 0.05
+
+    @property
+    def change(self) -> float:
+        """Relative change of the median compared to the baseline"""
+        baseline = statistics.median(self.baseline)
+        if baseline == 0:
+            return 0.0
+        return statistics.median(self.current) / baseline - 1
+
+    @property
+    def enough_samples(self) -> bool:
+        return min_mann_whitney_p_value(len(self.baseline), len(self.current)) < self.ALPHA
+
+    @property
+    def significant(self) -> bool:
+        return self.p_value < self.ALPHA and abs(self.change) >= self.MIN_CHANGE
+
+    @property
+    def regression(self) -> bool:
+        return self.significant and (
+            (self.change > 0) == (self.report == MetricReport.LOWER_IS_BETTER)
+        )
+
+    def __str__(self) -> str:
+        return "{}.{}: {:,.4g} -> {:,.4g} {} ({:+.1%}, p={:.3f})".format(
+            self.suit,
+            self.name,
+            statistics.median(self.baseline),
+            statistics.median(self.current),
+            self.unit,
+            self.change,
+            self.p_value,
+        )
+
+
+def _property_samples(recorded_property: Dict[str, Any]) -> List[float]:
+    # metrics recorded with `record_samples` keep all the measurements
+    samples = recorded_property.get("samples") or [recorded_property["value"]]
+    return [float(v) for v in samples if isinstance(v, (int, float))]
+
+
+class PerfBaseline:
+    """
+    Metrics of earlier runs, loaded from the json files of an `--out-dir`, to compare
+    new results with. Each earlier run contributes its value of a metric as a sample,
+    or all its samples if the metric was recorded with `record_samples`.
+    """
+
+    def __init__(self, samples: Dict[Tuple[str, str], List[float]]):
+        # (suit, metric name) -> samples
+        self.samples = samples
+
+    @classmethod
+    def load(cls, directory: Path, fingerprint: Dict[str, Any]) -> "PerfBaseline":
+        samples: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+        for path in sorted(directory.glob("*.json")):
+            run_data = json.loads(path.read_text())
+            run_fingerprint = run_data.get("fingerprint")
+            if run_fingerprint is not None and run_fingerprint != fingerprint:
+                log.warning(f"skipping baseline {path}, it was recorded in another environment")
+                continue
+            for suit_result in run_data["result"]:
+                for recorded_property in suit_result["data"]:
+                    key = (suit_result["suit"], recorded_property["name"])
+                    samples[key].extend(_property_samples(recorded_property))
+        return cls(samples)
+
+    def compare(
+        self, suit: str, recorded_properties: Iterable[Dict[str, Any]]
+    ) -> List[BaselineComparison]:
+        comparisons = []
+        for recorded_property in recorded_properties:
+            report = MetricReport(recorded_property["report"])
+            baseline = self.samples.get((suit, recorded_property["name"]))
+            current = _property_samples(recorded_property)
+            if report == MetricReport.TEST_PARAM or not baseline or not current:
+                continue
+            _, p_value = mann_whitney_u(baseline, current)
+            comparisons.append(
+                BaselineComparison(
+                    suit=suit,
+                    name=recorded_property["name"],
+                    unit=recorded_property["unit"],
+                    report=report,
+                    baseline=baseline,
+                    current=current,
+                    p_value=p_value,
+                )
+            )
+        return comparisons
+
+
+@functools.lru_cache(maxsize=None)
+def load_perf_baseline(directory: str) -> PerfBaseline:
+    return PerfBaseline.load(Path(directory), get_environment_fingerprint())
+
+
+def _benchmark_properties(user_properties: Iterable[Tuple[str, object]]) -> List[Dict[str, Any]]:
+    return [
+        cast(Dict[str, Any], p)
+        for name, p in user_properties
+        if name.startswith("neon_benchmarker_")
+    ]
+
+
+# A local pageserver, or just the HTTP API of a local or remote one
+PageserverApi = Union[NeonPageserver, PageserverHttpClient]
+
+
+def _http_client(pageserver: PageserverApi) -> PageserverHttpClient:
+    if isinstance(pageserver, PageserverHttpClient):
+        return pageserver
+    return pageserver.http_client()
+
+
+# Metrics recorded by `NeonBenchmarker.record_metrics_delta` by default
+PAGESERVER_METRICS_DELTA: Tuple[str, ...] = PAGESERVER_PER_TENANT_METRICS + (
+    "libmetrics_disk_io_bytes_total",
+)
+
+
+# Histograms that mix different kinds of observations, told apart by a label. Their
+# quantiles are only meaningful per kind, e.g. GetPage latency on its own.
+HISTOGRAM_KIND_LABELS: Dict[str, str] = {
+    "pageserver_smgr_query_seconds": "smgr_query_type",
+    # compaction, gc, layer flush, ...
+    "pageserver_storage_operations_seconds": "operation",
+}
+
+
 class NeonBenchmarker:
     """
     An object for recording benchmark results. This is created for each test
@@ -210,6 +793,19 @@ class NeonBenchmarker:
         # property recorder here is a pytest fixture provided by junitxml module
         # https://docs.pytest.org/en/6.2.x/reference.html#pytest.junitxml.record_property
         self.property_recorder = property_recorder
+        # Added to every recorded metric, e.g. the configuration the test runs with
+        self.tags: Dict[str, Any] = {}
+
+    def _record_property(
+        self,
+        metric_name: str,
+        recorded_property: Dict[str, Any],
+        tags: Optional[Dict[str, Any]] = None,
+    ):
+        if self.tags or tags:
+            recorded_property["tags"] = {**self.tags, **(tags or {})}
+        # just to namespace the value
+        self.property_recorder(f"neon_benchmarker_{metric_name}", recorded_property)
 
     def record(
         self,
@@ -217,20 +813,20 @@ class NeonBenchmarker:
         metric_value: float,
         unit: str,
         report: MetricReport,
+        tags: Optional[Dict[str, Any]] = None,
     ):
         """
-        Record a benchmark result.
+        Record a benchmark result. `tags` are added to the ones of the benchmark.
         """
-        # just to namespace the value
-        name = f"neon_benchmarker_{metric_name}"
-        self.property_recorder(
-            name,
+        self._record_property(
+            metric_name,
             {
                 "name": metric_name,
                 "value": metric_value,
                 "unit": unit,
                 "report": report,
             },
+            tags,
         )
 
     @contextmanager
@@ -252,6 +848,106 @@ class NeonBenchmarker:
             report=MetricReport.LOWER_IS_BETTER,
         )
 
+    def record_histogram(
+        self,
+        metric_name: str,
+        histogram: LatencyHistogram,
+        unit: str,
+        report: MetricReport = MetricReport.LOWER_IS_BETTER,
+    ):
+        """
+        Record p50/p90/p99/p99.9 and max of a histogram as separate metrics. The
+        buckets themselves are stored along with the `{metric_name}_count` metric,
+        so any other quantile can be recomputed later from the results json, see
+        `LatencyHistogram.from_dict`.
+        """
+        if histogram.count == 0:
+            log.warning(f"histogram {metric_name} is empty, nothing to record")
+            return
+
+        for q in LatencyHistogram.QUANTILES:
+            self.record(f"{metric_name}_{quantile_suffix(q)}", histogram.quantile(q), unit, report)
+        assert histogram.max is not None
+        self.record(f"{metric_name}_max", histogram.max, unit, report)
+
+        self._record_property(
+            f"{metric_name}_count",
+            {
+                "name": f"{metric_name}_count",
+                "value": histogram.count,
+                "unit": "",
+                "report": MetricReport.TEST_PARAM,
+                "histogram": histogram.to_dict(),
+            },
+        )
+
+    def repeat(self, metric_name: str, n: int, warmup: int = 0) -> Iterator[int]:
+        """
+        Run the loop body `warmup + n` times, and record the duration of the last `n`
+        iterations with `record_samples`. Usage:
+
+        for _ in zenbenchmark.repeat('foobar_runtime', 10, warmup=2):
+            foobar()   # measure this
+        """
+        assert n > 0
+        samples = []
+        for i in range(warmup + n):
+            start = timeit.default_timer()
+            yield i
+            end = timeit.default_timer()
+            if i >= warmup:
+                samples.append(end - start)
+
+        self.record_samples(metric_name, samples, "s", MetricReport.LOWER_IS_BETTER)
+
+    def record_samples(
+        self,
+        metric_name: str,
+        samples: List[float],
+        unit: str,
+        report: MetricReport,
+        max_ci_width: float = 0.1,
+    ):
+        """
+        Record repeated measurements of the same metric.
+
+        The median is recorded as `metric_name`, along with its bootstrapped 95%
+        confidence interval and the relative spread ((max - min) / median) of the
+        samples. If the confidence interval is wider than `max_ci_width` of the
+        median, the result is marked as unreliable in the terminal summary.
+        The raw samples are kept in the results json.
+        """
+        assert samples, f"no samples for {metric_name}"
+        median = statistics.median(samples)
+        ci_low, ci_high = bootstrap_median_ci(samples)
+        ci_width = (ci_high - ci_low) / median if median != 0 else 0.0
+        unreliable = ci_width > max_ci_width
+        if unreliable:
+            log.warning(
+                f"{metric_name}: 95% CI [{ci_low}, {ci_high}] is {ci_width:.1%} of the median "
+                f"{median}, more than {max_ci_width:.1%}; the result is not reliable"
+            )
+
+        self._record_property(
+            metric_name,
+            {
+                "name": metric_name,
+                "value": median,
+                "unit": unit,
+                "report": report,
+                "samples": samples,
+                "unreliable": unreliable,
+            },
+        )
+        self.record(f"{metric_name}.ci95_low", ci_low, unit, report)
+        self.record(f"{metric_name}.ci95_high", ci_high, unit, report)
+        self.record(
+            f"{metric_name}.rel_spread",
+            (max(samples) - min(samples)) / median if median != 0 else 0.0,
+            "",
+            MetricReport.LOWER_IS_BETTER,
+        )
+
     def record_pg_bench_result(self, prefix: str, pg_bench_result: PgBenchRunResult):
         self.record(
             f"{prefix}.number_of_clients",
@@ -311,6 +1007,27 @@ class NeonBenchmarker:
             MetricReport.TEST_PARAM,
         )
 
+        progress_stats = PgBenchProgressStats.from_progress(pg_bench_result.progress)
+        if progress_stats is not None:
+            self.record(
+                f"{prefix}.min_interval_tps",
+                progress_stats.min_interval_tps,
+                "",
+                report=MetricReport.HIGHER_IS_BETTER,
+            )
+            self.record(
+                f"{prefix}.tps_cv",
+                progress_stats.tps_cv,
+                "",
+                report=MetricReport.LOWER_IS_BETTER,
+            )
+            self.record(
+                f"{prefix}.longest_stall",
+                progress_stats.longest_stall,
+                unit="s",
+                report=MetricReport.LOWER_IS_BETTER,
+            )
+
     def record_pg_bench_init_result(self, prefix: str, result: PgBenchInitResult):
         test_params = [
             "start_timestamp",
@@ -335,52 +1052,324 @@ class NeonBenchmarker:
                     f"{prefix}.{metric}", value, unit="s", report=MetricReport.LOWER_IS_BETTER
                 )
 
-    def get_io_writes(self, pageserver: NeonPageserver) -> int:
+    def record_pg_bench_transaction_log(self, prefix: str, log: PgBenchTransactionLog):
+        quantiles = LatencyHistogram.QUANTILES + (1.0,)
+        for q, value in zip(quantiles, log.latency_quantiles(quantiles)):
+            self.record(
+                f"{prefix}.latency_{quantile_suffix(q)}",
+                value,
+                unit="ms",
+                report=MetricReport.LOWER_IS_BETTER,
+            )
+
+        if per_second_tps := log.per_second_tps():
+            self.record(
+                f"{prefix}.per_second_tps_min",
+                min(per_second_tps),
+                "",
+                report=MetricReport.HIGHER_IS_BETTER,
+            )
+            self.record(
+                f"{prefix}.per_second_tps_median",
+                statistics.median(per_second_tps),
+                "",
+                report=MetricReport.HIGHER_IS_BETTER,
+            )
+
+        self.record(
+            f"{prefix}.client_fairness",
+            log.client_fairness(),
+            "",
+            report=MetricReport.HIGHER_IS_BETTER,
+        )
+
+    def get_io_writes(self, pageserver: PageserverApi) -> int:
         """
         Fetch the "cumulative # of bytes written" metric from the pageserver
         """
         metric_name = r'libmetrics_disk_io_bytes_total{io_operation="write"}'
         return self.get_int_counter_value(pageserver, metric_name)
 
-    def get_peak_mem(self, pageserver: NeonPageserver) -> int:
+    def get_peak_mem(self, pageserver: PageserverApi) -> int:
         """
         Fetch the "maxrss" metric from the pageserver
         """
         metric_name = r"libmetrics_maxrss_kb"
         return self.get_int_counter_value(pageserver, metric_name)
 
-    def get_int_counter_value(self, pageserver: NeonPageserver, metric_name: str) -> int:
-        """Fetch the value of given int counter from pageserver metrics."""
-        # TODO: If we start to collect more of the prometheus metrics in the
-        # performance test suite like this, we should refactor this to load and
-        # parse all the metrics into a more convenient structure in one go.
-        #
+    def get_int_counter_value(self, pageserver: PageserverApi, metric_name: str) -> int:
+        """
+        Fetch the value of given int counter from pageserver metrics. To collect
+        many metrics at once, use parse_metrics, as record_metrics_delta does.
+        """
         # The metric should be an integer, as it's a number of bytes. But in general
         # all prometheus metrics are floats. So to be pedantic, read it as a float
         # and round to integer.
-        all_metrics = pageserver.http_client().get_metrics()
+        all_metrics = _http_client(pageserver).get_metrics()
         matches = re.search(rf"^{metric_name} (\S+)$", all_metrics, re.MULTILINE)
         assert matches, f"metric {metric_name} not found"
         return int(round(float(matches.group(1))))
 
+    def record_data_uploaded(
+        self, pageserver: PageserverApi, tenant_id: TenantId, timeline_id: TimelineId
+    ):
+        """Record the number and size of the persistent files written for a timeline"""
+        params = f'{{tenant_id="{tenant_id}",timeline_id="{timeline_id}"}}'
+        total_files = self.get_int_counter_value(
+            pageserver, "pageserver_created_persistent_files_total" + params
+        )
+        total_bytes = self.get_int_counter_value(
+            pageserver, "pageserver_written_persistent_bytes_total" + params
+        )
+        self.record(
+            "data_uploaded", total_bytes / (1024 * 1024), "MB", report=MetricReport.LOWER_IS_BETTER
+        )
+        self.record("num_files_uploaded", total_files, "", report=MetricReport.LOWER_IS_BETTER)
+
     def get_timeline_size(
         self, repo_dir: Path, tenant_id: TenantId, timeline_id: TimelineId
     ) -> int:
         """
         Calculate the on-disk size of a timeline
         """
-        path = f"{repo_dir}/tenants/{tenant_id}/timelines/{timeline_id}"
+        return get_dir_size(repo_dir / "tenants" / str(tenant_id) / "timelines" / str(timeline_id))
 
-        totalbytes = 0
-        for root, dirs, files in os.walk(path):
-            for name in files:
-                totalbytes += os.path.getsize(os.path.join(root, name))
+    def record_timeline_layers(self, prefix: str, timeline_layers: TimelineLayers):
+        """
+        Record the composition of a timeline's layer files: the number and size of
+        image, L0 delta and L1 delta layers and of other files, the LSN range they
+        cover, and how the image and L1 delta layers are spread over key ranges.
+        """
 
-        return totalbytes
+        def record_layers(kind: str, layers: List[LayerFile]):
+            self.record(f"{prefix}.{kind}_count", len(layers), "", MetricReport.LOWER_IS_BETTER)
+            self.record(
+                f"{prefix}.{kind}_size",
+                sum(layer.size for layer in layers) / (1024 * 1024),
+                "MB",
+                MetricReport.LOWER_IS_BETTER,
+            )
+
+        def record_key_ranges(kind: str, layers: List[LayerFile]):
+            bytes_per_range: Dict[Tuple[int, int], int] = defaultdict(int)
+            for layer in layers:
+                bytes_per_range[(layer.key_start, layer.key_end)] += layer.size
+            self.record(
+                f"{prefix}.{kind}_key_ranges",
+                len(bytes_per_range),
+                "",
+                MetricReport.LOWER_IS_BETTER,
+            )
+            # how much of the data is in the largest key range, 100% if it's not partitioned
+            total = sum(bytes_per_range.values())
+            if total > 0:
+                self.record(
+                    f"{prefix}.{kind}_largest_key_range_share",
+                    max(bytes_per_range.values()) / total * 100,
+                    "%",
+                    MetricReport.LOWER_IS_BETTER,
+                )
+
+        image_layers = timeline_layers.image_layers
+        l0_delta_layers = [layer for layer in timeline_layers.delta_layers if layer.is_l0]
+        l1_delta_layers = [layer for layer in timeline_layers.delta_layers if not layer.is_l0]
+        record_layers("image_layers", image_layers)
+        record_layers("l0_delta_layers", l0_delta_layers)
+        record_layers("l1_delta_layers", l1_delta_layers)
+        record_key_ranges("image_layers", image_layers)
+        record_key_ranges("l1_delta_layers", l1_delta_layers)
+
+        self.record(
+            f"{prefix}.other_files_size",
+            timeline_layers.other_bytes / (1024 * 1024),
+            "MB",
+            MetricReport.LOWER_IS_BETTER,
+        )
+        if timeline_layers.layers:
+            # the amount of WAL between the oldest and the newest layer
+            lsn_span = max(layer.lsn_end for layer in timeline_layers.layers) - min(
+                layer.lsn_start for layer in timeline_layers.layers
+            )
+            self.record(
+                f"{prefix}.lsn_span", lsn_span / (1024 * 1024), "MB", MetricReport.LOWER_IS_BETTER
+            )
+        self.record_read_amplification(prefix, LayerMapModel(timeline_layers.layers))
+
+    def record_read_amplification(
+        self, prefix: str, layer_map: LayerMapModel, lsn: Optional[int] = None
+    ):
+        """
+        Record how many layers a GetPage at `lsn` (the newest one by default) visits
+        over the key space of `layer_map`, how many of them are delta layers, and the
+        number of key ranges that are not covered by an image layer.
+        """
+        read_amplification = layer_map.read_amplification(lsn)
+        if not read_amplification:
+            return
+        self.record(
+            f"{prefix}.read_amplification_max",
+            max(read_amplification),
+            "",
+            MetricReport.LOWER_IS_BETTER,
+        )
+        self.record(
+            f"{prefix}.read_amplification_avg",
+            statistics.mean(read_amplification),
+            "",
+            MetricReport.LOWER_IS_BETTER,
+        )
+        depths = layer_map.delta_chain_depths(lsn)
+        self.record(
+            f"{prefix}.delta_chain_depth_max", max(depths), "", MetricReport.LOWER_IS_BETTER
+        )
+        self.record(
+            f"{prefix}.delta_chain_depth_avg",
+            sum(depth * n for depth, n in depths.items()) / sum(depths.values()),
+            "",
+            MetricReport.LOWER_IS_BETTER,
+        )
+        self.record(
+            f"{prefix}.coverage_holes",
+            len(layer_map.coverage_holes(lsn)),
+            "",
+            MetricReport.LOWER_IS_BETTER,
+        )
+
+    @contextmanager
+    def record_metrics_delta(
+        self,
+        pageserver: PageserverApi,
+        prefix: str,
+        metric_names: Iterable[str] = PAGESERVER_METRICS_DELTA,
+        label_filter: Optional[Dict[str, str]] = None,
+    ) -> Iterator[None]:
+        """
+        Scrape the pageserver metrics once before and once after the enclosed block,
+        and record how much each of `metric_names` changed, summed over all the
+        samples matching `label_filter` (e.g. all tenants). Usage:
+
+        with zenbenchmark.record_metrics_delta(env.pageserver, "insert"):
+            run_workload()
+
+        For histograms, pass the `_bucket` name: its `_count` and `_sum` deltas, and the
+        average, median and p99 of the observations made during the block, are recorded.
+        The quantiles are estimated from the buckets, see Histogram.quantile. For the
+        histograms in HISTOGRAM_KIND_LABELS, they are recorded per kind of observation,
+        e.g. as `{prefix}.pageserver_smgr_query_seconds.get_page_at_lsn_p99`.
+        """
+        client = _http_client(pageserver)
+        before = parse_metrics(client.get_metrics(), "pageserver")
+        yield
+        after = parse_metrics(client.get_metrics(), "pageserver")
+
+        def delta(name: str) -> float:
+            result = 0.0
+            for sample in after.query_all(name, label_filter or {}):
+                result += sample.value
+                prev = before.query_exact(name, sample.labels)
+                if prev is not None:
+                    result -= prev.value
+            return result
+
+        def unit_of(name: str) -> str:
+            if "_seconds" in name:
+                return "s"
+            if "_bytes" in name:
+                return "bytes"
+            return ""
+
+        def record_histogram_stats(
+            base: str, filter: Dict[str, str], metric_prefix: str, tags: Dict[str, str]
+        ):
+            histogram = Histogram.from_metrics(after, base, filter) - (
+                Histogram.from_metrics(before, base, filter)
+            )
+            for stat, value in (
+                ("avg", histogram.mean),
+                ("p50", histogram.quantile(0.5)),
+                ("p99", histogram.quantile(0.99)),
+            ):
+                if value is not None:
+                    self.record(
+                        f"{metric_prefix}_{stat}",
+                        value,
+                        unit_of(base),
+                        report=MetricReport.LOWER_IS_BETTER,
+                        tags=tags,
+                    )
+
+        recorded = set()
+        for name in metric_names:
+            names = [name]
+            if name.endswith("_bucket"):
+                base = name.removesuffix("_bucket")
+                names = [f"{base}_count", f"{base}_sum"]
+                kind_label = HISTOGRAM_KIND_LABELS.get(base)
+                if kind_label is None:
+                    record_histogram_stats(base, label_filter or {}, f"{prefix}.{base}", {})
+                else:
+                    kinds = {
+                        sample.labels[kind_label]
+                        for sample in after.query_all(f"{base}_count", label_filter or {})
+                        if kind_label in sample.labels
+                    }
+                    for kind in sorted(kinds):
+                        record_histogram_stats(
+                            base,
+                            {**(label_filter or {}), kind_label: kind},
+                            f"{prefix}.{base}.{kind}",
+                            {kind_label: kind},
+                        )
+
+            for metric in names:
+                if metric in recorded:
+                    continue
+                recorded.add(metric)
+                report = (
+                    MetricReport.HIGHER_IS_BETTER
+                    if metric.endswith("_hits_total")
+                    else MetricReport.LOWER_IS_BETTER
+                )
+                # _count of a histogram is a number of observations, not seconds
+                unit = "" if metric.endswith("_count") else unit_of(metric)
+                self.record(f"{prefix}.{metric}", delta(metric), unit, report=report)
+
+    @contextmanager
+    def profile_phase(self, pageserver: NeonPageserver, phase: str) -> Iterator[Path]:
+        """
+        Profile the page requests the pageserver serves during the enclosed block,
+        and save the flamegraph as `profiles/<phase>/flamegraph.svg` in the repo dir,
+        where it's picked up by the Allure report. Yields the path of the flamegraph.
+
+        The pageserver has to be restarted with profiling enabled at the start of
+        the phase, and once more at the end of it to write out the flamegraph and
+        disable profiling again, so it starts the phase with cold caches.
+        Skips the test if the pageserver was built without the 'profiling' feature.
+        """
+        pageserver.is_profiling_enabled_or_skip()
+
+        # the pageserver writes the flamegraph into its workdir on exit
+        flamegraph = pageserver.env.repo_dir / "flamegraph.svg"
+        phase_flamegraph = pageserver.env.repo_dir / "profiles" / phase / "flamegraph.svg"
+        assert not phase_flamegraph.exists(), f"phase {phase} has already been profiled"
+
+        pageserver.stop()
+        flamegraph.unlink(missing_ok=True)
+        pageserver.start(overrides=('--pageserver-config-override=profiling="page_requests"',))
+        try:
+            yield phase_flamegraph
+        finally:
+            pageserver.stop()
+            if flamegraph.exists():
+                phase_flamegraph.parent.mkdir(parents=True, exist_ok=True)
+                flamegraph.rename(phase_flamegraph)
+            else:
+                log.warning(f"pageserver wrote no flamegraph for phase {phase}")
+            pageserver.start()
 
     @contextmanager
     def record_pageserver_writes(
-        self, pageserver: NeonPageserver, metric_name: str
+        self, pageserver: PageserverApi, metric_name: str
     ) -> Iterator[None]:
         """
         Record bytes written by the pageserver during a test.
@@ -398,14 +1387,35 @@ class NeonBenchmarker:
 
 
 @pytest.fixture(scope="function")
-def zenbenchmark(record_property: Callable[[str, object], None]) -> Iterator[NeonBenchmarker]:
+def zenbenchmark(
+    record_property: Callable[[str, object], None], request: FixtureRequest
+) -> Iterator[NeonBenchmarker]:
     """
     This is a python decorator for benchmark fixtures. It contains functions for
     recording measurements, and prints them out at the end.
+
+    With `--perf-baseline=<dir> --perf-baseline-fail`, the test fails at teardown
+    if any of its metrics regressed significantly compared to the baseline.
     """
     benchmarker = NeonBenchmarker(record_property)
     yield benchmarker
 
+    baseline_dir = request.config.getoption("perf_baseline")
+    if baseline_dir is None or not request.config.getoption("perf_baseline_fail"):
+        return
+    regressions = [
+        comparison
+        for comparison in load_perf_baseline(baseline_dir).compare(
+            request.node.nodeid, _benchmark_properties(request.node.user_properties)
+        )
+        if comparison.regression
+    ]
+    if regressions:
+        pytest.fail(
+            "significant regressions compared to the baseline:\n"
+            + "\n".join(str(regression) for regression in regressions)
+        )
+
 
 def pytest_addoption(parser: Parser):
     parser.addoption(
@@ -413,6 +1423,93 @@ def pytest_addoption(parser: Parser):
         dest="out_dir",
         help="Directory to output performance tests results to.",
     )
+    parser.addoption(
+        "--perf-baseline",
+        dest="perf_baseline",
+        help="Directory with results of earlier runs (an --out-dir) to compare the results with.",
+    )
+    parser.addoption(
+        "--perf-baseline-fail",
+        dest="perf_baseline_fail",
+        action="store_true",
+        help="Fail tests with significant regressions compared to --perf-baseline.",
+    )
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return os.uname().machine
+
+
+def _filesystem_type(path: Path) -> Optional[str]:
+    """Return the type of the filesystem `path` is on, from its longest matching mountpoint"""
+    path = path.resolve()
+    best: Optional[Tuple[int, str]] = None
+    for partition in psutil.disk_partitions(all=True):
+        mountpoint = Path(partition.mountpoint)
+        if mountpoint == path or mountpoint in path.parents:
+            if best is None or len(mountpoint.parts) > best[0]:
+                best = (len(mountpoint.parts), partition.fstype)
+    return best[1] if best is not None else None
+
+
+def _pageserver_features(binpath: Path) -> Optional[List[str]]:
+    """
+    Return the features the pageserver was built with, e.g. ["testing", "profiling"],
+    or None if there's no pageserver binary, as in remote environments.
+    """
+    try:
+        res = subprocess.run(
+            [str(binpath / "pageserver"), "--enabled-features"],
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        features: List[str] = json.loads(res.stdout)["features"]
+        return sorted(features)
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError) as e:
+        log.info(f"cannot get pageserver features from {binpath}: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_environment_fingerprint() -> Dict[str, Any]:
+    """
+    Describe the machine and the build the benchmarks ran on, so that results from
+    different hardware or build profiles are not compared with each other.
+
+    Paths and versions are resolved the same way as the `neon_binpath`,
+    `top_output_dir` and `pg_version` fixtures do.
+    """
+    base_dir = get_self_dir().parent.parent
+    build_type = os.environ.get("BUILD_TYPE", "debug")
+    if env_neon_bin := os.environ.get("NEON_BIN"):
+        binpath = Path(env_neon_bin)
+    else:
+        binpath = base_dir / "target" / build_type
+    if env_test_output := os.environ.get("TEST_OUTPUT"):
+        output_dir = Path(env_test_output)
+    else:
+        output_dir = base_dir / DEFAULT_OUTPUT_DIR
+
+    return {
+        "cpu_model": _cpu_model(),
+        "cpu_cores": psutil.cpu_count(logical=False),
+        "cpu_threads": psutil.cpu_count(logical=True),
+        "memory_bytes": psutil.virtual_memory().total,
+        "kernel": os.uname().release,
+        "filesystem": _filesystem_type(output_dir),
+        "pageserver_features": _pageserver_features(binpath),
+        "pg_version": os.environ.get("DEFAULT_PG_VERSION", DEFAULT_PG_VERSION_DEFAULT),
+        "build_type": build_type,
+    }
 
 
 def get_out_path(target_dir: Path, revision: str) -> Path:
@@ -429,6 +1526,35 @@ def get_out_path(target_dir: Path, revision: str) -> Path:
     return path
 
 
+def _report_baseline_comparison(
+    terminalreporter: TerminalReporter, baseline: PerfBaseline, result: List[Dict[str, Any]]
+):
+    terminalreporter.section("Comparison with baseline", "-")
+    comparisons = [
+        comparison
+        for suit_result in result
+        for comparison in baseline.compare(suit_result["suit"], suit_result["data"])
+    ]
+    for comparison in comparisons:
+        if comparison.regression:
+            terminalreporter.line(f"REGRESSION {comparison}", red=True)
+        elif comparison.significant:
+            terminalreporter.line(f"improvement {comparison}", green=True)
+
+    significant = sum(c.significant for c in comparisons)
+    without_samples = sum(not c.enough_samples for c in comparisons)
+    terminalreporter.line(
+        f"{len(comparisons)} metrics compared, {significant} changed significantly "
+        f"(p < {BaselineComparison.ALPHA}, change >= {BaselineComparison.MIN_CHANGE:.0%})"
+    )
+    if without_samples:
+        terminalreporter.line(
+            f"{without_samples} metrics have too few samples to detect a significant change, "
+            "record them with zenbenchmark.repeat or add more baseline runs",
+            yellow=True,
+        )
+
+
 # Hook to print the results at the end
 @pytest.hookimpl(hookwrapper=True)
 def pytest_terminal_summary(
@@ -458,7 +1584,10 @@ def pytest_terminal_summary(
                 terminalreporter.write("{0:,.4f}".format(value), green=True)
             else:
                 terminalreporter.write(str(value), green=True)
-            terminalreporter.line(" {}".format(unit))
+            if recorded_property.get("unreliable"):
+                terminalreporter.line(" {} (unreliable: 95% CI too wide)".format(unit), yellow=True)
+            else:
+                terminalreporter.line(" {}".format(unit))
 
             result_entry.append(recorded_property)
 
@@ -470,6 +1599,10 @@ def pytest_terminal_summary(
             }
         )
 
+    baseline_dir = config.getoption("perf_baseline")
+    if baseline_dir is not None:
+        _report_baseline_comparison(terminalreporter, load_perf_baseline(baseline_dir), result)
+
     out_dir = config.getoption("out_dir")
     if out_dir is None:
         warnings.warn("no out dir provided to store performance test results")
@@ -480,5 +1613,13 @@ def pytest_terminal_summary(
         return
 
     get_out_path(Path(out_dir), revision=revision).write_text(
-        json.dumps({"revision": revision, "platform": platform, "result": result}, indent=4)
+        json.dumps(
+            {
+                "revision": revision,
+                "platform": platform,
+                "fingerprint": get_environment_fingerprint(),
+                "result": result,
+            },
+            indent=4,
+        )
     )
@@ -1,14 +1,45 @@
+import itertools
+import os
+import statistics
+import threading
+import timeit
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import _GeneratorContextManager, contextmanager
+from dataclasses import dataclass
 
 # Type-related stuff
-from typing import Dict, Iterator, List
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar
 
 import pytest
+from _pytest.config import Config
 from _pytest.fixtures import FixtureRequest
-from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker
-from fixtures.neon_fixtures import NeonEnv, PgBin, PgProtocol, RemotePostgres, VanillaPostgres
-from fixtures.pg_stats import PgStatTable
+from _pytest.python import Metafunc
+from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker, jain_fairness_index
+from fixtures.log_helper import log
+from fixtures.metrics_scraper import (
+    MetricsEndpoint,
+    neon_env_metrics_endpoints,
+    pageserver_metrics_endpoints,
+)
+from fixtures.neon_fixtures import (
+    DEFAULT_BRANCH_NAME,
+    NeonEnv,
+    NeonEnvBuilder,
+    PageserverApiException,
+    PageserverHttpClient,
+    PgBin,
+    PgProtocol,
+    Postgres,
+    RemotePostgres,
+    VanillaPostgres,
+)
+from fixtures.pg_stats import PgStatTable, WaitEventSampler
+from fixtures.resource_sampler import ProcessFinder, neon_env_processes, vanilla_processes
+from fixtures.types import Lsn, TenantId, TimelineId
+from fixtures.utils import TimelineLayers
+
+T = TypeVar("T")
 
 
 class PgCompare(ABC):
@@ -55,29 +86,115 @@ class PgCompare(ABC):
     def record_duration(self, out_name):
         pass
 
+    def processes(self) -> ProcessFinder:
+        """Local processes to sample with the resource_sampler fixture"""
+        return lambda: {}
+
+    def metrics_endpoints(self) -> Dict[str, MetricsEndpoint]:
+        """/metrics endpoints to scrape with the metrics_scraper fixture"""
+        return {}
+
+    @contextmanager
+    def record_metrics_delta(self, prefix: str) -> Iterator[None]:
+        """
+        Record how the pageserver metrics changed during the enclosed block, see
+        NeonBenchmarker.record_metrics_delta. Does nothing if there's no pageserver.
+        """
+        yield
+
+    @contextmanager
+    def profile_phase(self, phase: str) -> Iterator[None]:
+        """
+        Collect a pageserver flamegraph of the enclosed block, see
+        NeonBenchmarker.profile_phase. Does nothing if there's no pageserver.
+        """
+        yield
+
+    @contextmanager
+    def record_safekeeper_lag(self, prefix: str, interval: float = 0.5) -> Iterator[None]:
+        """
+        Record how far the safekeepers lag behind the compute during the enclosed
+        block, see NeonCompare.record_safekeeper_lag. Does nothing if there are no
+        safekeepers.
+        """
+        yield
+
+    def repeat(self, out_name: str, n: int, warmup: int = 0) -> Iterator[int]:
+        """Time each of `n` iterations after `warmup`, see NeonBenchmarker.repeat"""
+        return self.zenbenchmark.repeat(out_name, n, warmup)
+
     @contextmanager
     def record_pg_stats(self, pg_stats: List[PgStatTable]) -> Iterator[None]:
+        """
+        Record how the counters of `pg_stats` changed during the enclosed block.
+        Rows that appeared in the meantime, e.g. of a new table, count from 0.
+        For every pair of `*_hit` and `*_read` counters, also record the hit ratio.
+        """
         init_data = self._retrieve_pg_stats(pg_stats)
 
         yield
 
-        data = self._retrieve_pg_stats(pg_stats)
+        reports: Dict[str, MetricReport] = {}
+        data = self._retrieve_pg_stats(pg_stats, reports)
+
+        deltas = {k: data[k] - init_data.get(k, 0) for k in data}
+        for k, delta in deltas.items():
+            self.zenbenchmark.record(k, delta, "", reports[k])
+
+        for k, hits in deltas.items():
+            if not k.endswith("_hit"):
+                continue
+            prefix = k.removesuffix("_hit")
+            reads = deltas.get(f"{prefix}_read")
+            if reads is not None and hits + reads > 0:
+                self.zenbenchmark.record(
+                    f"{prefix}_hit_ratio",
+                    hits / (hits + reads) * 100,
+                    "%",
+                    MetricReport.HIGHER_IS_BETTER,
+                )
 
-        for k in set(init_data) & set(data):
-            self.zenbenchmark.record(k, data[k] - init_data[k], "", MetricReport.HIGHER_IS_BETTER)
-
-    def _retrieve_pg_stats(self, pg_stats: List[PgStatTable]) -> Dict[str, int]:
+    @contextmanager
+    def record_wait_events(self, prefix: str, interval: float = 0.01) -> Iterator[None]:
+        """
+        Sample the wait events of the active backends every `interval` seconds
+        during the enclosed block, and record what share of their time went to
+        each of them as `{prefix}.wait_events.*`, see WaitEventSampler.
+        """
+        sampler = WaitEventSampler(self.pg, interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+        sampler.report(self.zenbenchmark, f"{prefix}.wait_events")
+
+    def _retrieve_pg_stats(
+        self,
+        pg_stats: List[PgStatTable],
+        reports: Optional[Dict[str, MetricReport]] = None,
+    ) -> Dict[str, int]:
+        """The counters of `pg_stats` by name, and their report types into `reports`"""
         results: Dict[str, int] = {}
 
         with self.pg.connect().cursor() as cur:
             for pg_stat in pg_stats:
                 cur.execute(pg_stat.query)
-                row = cur.fetchone()
-                assert row is not None
-                assert len(row) == len(pg_stat.columns)
-
-                for col, val in zip(pg_stat.columns, row):
-                    results[f"{pg_stat.table}.{col}"] = int(val)
+                if pg_stat.key_column is None:
+                    row = cur.fetchone()
+                    assert row is not None
+                    rows = {pg_stat.table: row}
+                else:
+                    rows = {f"{pg_stat.table}.{row[0]}": row[1:] for row in cur.fetchall()}
+
+                for prefix, row in rows.items():
+                    assert len(row) == len(pg_stat.columns)
+                    for col, val in zip(pg_stat.column_names, row):
+                        # e.g. toast_blks_hit of a table without TOAST
+                        if val is not None:
+                            results[f"{prefix}.{col}"] = int(val)
+                            if reports is not None:
+                                reports[f"{prefix}.{col}"] = pg_stat.report(col)
 
         return results
 
@@ -91,15 +208,32 @@ class NeonCompare(PgCompare):
         neon_simple_env: NeonEnv,
         pg_bin: PgBin,
         branch_name: str,
+        tenant_id: Optional[TenantId] = None,
+        config_lines: Optional[List[str]] = None,
     ):
+        """
+        Runs on a new branch of the initial tenant, or on a new timeline of
+        `tenant_id` if it's given. `config_lines` are added to postgresql.conf
+        of the compute.
+        """
         self.env = neon_simple_env
         self._zenbenchmark = zenbenchmark
         self._pg_bin = pg_bin
-        self.pageserver_http_client = self.env.pageserver.http_client()
+        # the token is ignored if auth is disabled
+        self.pageserver_http_client = self.env.pageserver.http_client(
+            auth_token=self.env.auth_keys.generate_pageserver_token()
+        )
 
         # We only use one branch and one timeline
-        self.env.neon_cli.create_branch(branch_name, "empty")
-        self._pg = self.env.postgres.create_start(branch_name)
+        if tenant_id is None:
+            self.tenant = self.env.initial_tenant
+            self.env.neon_cli.create_branch(branch_name, "empty")
+        else:
+            self.tenant = tenant_id
+            self.env.neon_cli.create_timeline(branch_name, tenant_id=tenant_id)
+        self._pg = self.env.postgres.create_start(
+            branch_name, tenant_id=self.tenant, config_lines=config_lines
+        )
         self.timeline = self.pg.safe_psql("SHOW neon.timeline_id")[0][0]
 
     @property
@@ -115,59 +249,275 @@ class NeonCompare(PgCompare):
         return self._pg_bin
 
     def flush(self):
-        self.pageserver_http_client.timeline_gc(self.env.initial_tenant, self.timeline, 0)
+        self.pageserver_http_client.timeline_gc(self.tenant, self.timeline, 0)
 
     def compact(self):
-        self.pageserver_http_client.timeline_compact(self.env.initial_tenant, self.timeline)
+        self.pageserver_http_client.timeline_compact(self.tenant, self.timeline)
 
     def report_peak_memory_use(self):
         self.zenbenchmark.record(
             "peak_mem",
-            self.zenbenchmark.get_peak_mem(self.env.pageserver) / 1024,
+            self.zenbenchmark.get_peak_mem(self.pageserver_http_client) / 1024,
             "MB",
             report=MetricReport.LOWER_IS_BETTER,
         )
 
     def report_size(self):
         timeline_size = self.zenbenchmark.get_timeline_size(
-            self.env.repo_dir, self.env.initial_tenant, self.timeline
+            self.env.repo_dir, self.tenant, self.timeline
         )
         self.zenbenchmark.record(
             "size", timeline_size / (1024 * 1024), "MB", report=MetricReport.LOWER_IS_BETTER
         )
-
-        params = f'{{tenant_id="{self.env.initial_tenant}",timeline_id="{self.timeline}"}}'
-        total_files = self.zenbenchmark.get_int_counter_value(
-            self.env.pageserver, "pageserver_created_persistent_files_total" + params
+        self.zenbenchmark.record_timeline_layers(
+            "layers",
+            TimelineLayers.from_dir(self.env.timeline_dir(self.tenant, self.timeline)),
         )
-        total_bytes = self.zenbenchmark.get_int_counter_value(
-            self.env.pageserver, "pageserver_written_persistent_bytes_total" + params
+        self.zenbenchmark.record_data_uploaded(
+            self.pageserver_http_client, self.tenant, TimelineId(self.timeline)
         )
+
+    def record_pageserver_writes(self, out_name: str) -> _GeneratorContextManager[None]:
+        return self.zenbenchmark.record_pageserver_writes(self.pageserver_http_client, out_name)
+
+    def record_metrics_delta(self, prefix: str) -> _GeneratorContextManager[None]:
+        return self.zenbenchmark.record_metrics_delta(self.pageserver_http_client, prefix)
+
+    @contextmanager
+    def record_safekeeper_lag(self, prefix: str, interval: float = 0.5) -> Iterator[None]:
+        """
+        Poll the flush and commit LSNs of the safekeepers every `interval` seconds
+        during the enclosed block, and record how far they lag behind the WAL
+        flushed by the compute, as `{prefix}.flush_lag_*` for the slowest
+        safekeeper and `{prefix}.commit_lag_*` for the quorum.
+        """
+        if not self.env.safekeepers:
+            yield
+            return
+
+        safekeeper_token = self.env.auth_keys.generate_safekeeper_token()
+        clients = [sk.http_client(auth_token=safekeeper_token) for sk in self.env.safekeepers]
+        key = (self.tenant, TimelineId(self.timeline))
+        flush_lags: List[int] = []
+        commit_lags: List[int] = []
+        stop = threading.Event()
+
+        def sample():
+            with self.pg.cursor() as cur:
+                while not stop.is_set():
+                    cur.execute("SELECT pg_current_wal_flush_lsn()")
+                    row = cur.fetchone()
+                    assert row is not None
+                    compute_lsn = Lsn(row[0])
+                    metrics = [client.get_metrics() for client in clients]
+                    flush_lsns = [m.flush_lsn_inexact.get(key, 0) for m in metrics]
+                    commit_lsns = [m.commit_lsn_inexact.get(key, 0) for m in metrics]
+                    flush_lags.append(max(0, int(compute_lsn) - min(flush_lsns)))
+                    commit_lags.append(max(0, int(compute_lsn) - max(commit_lsns)))
+                    stop.wait(interval)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            sampling = executor.submit(sample)
+            try:
+                yield
+            finally:
+                stop.set()
+            sampling.result()
+
+        for name, lags in (("flush_lag", flush_lags), ("commit_lag", commit_lags)):
+            if not lags:
+                continue
+            self.zenbenchmark.record(
+                f"{prefix}.{name}_max",
+                max(lags) / (1024 * 1024),
+                "MB",
+                MetricReport.LOWER_IS_BETTER,
+            )
+            self.zenbenchmark.record(
+                f"{prefix}.{name}_avg",
+                statistics.mean(lags) / (1024 * 1024),
+                "MB",
+                MetricReport.LOWER_IS_BETTER,
+            )
+
+    @contextmanager
+    def profile_phase(self, phase: str) -> Iterator[None]:
+        with self.zenbenchmark.profile_phase(self.env.pageserver, phase):
+            yield
+
+    def processes(self) -> ProcessFinder:
+        return neon_env_processes(self.env)
+
+    def metrics_endpoints(self) -> Dict[str, MetricsEndpoint]:
+        return neon_env_metrics_endpoints(self.env)
+
+    def record_duration(self, out_name: str) -> _GeneratorContextManager[None]:
+        return self.zenbenchmark.record_duration(out_name)
+
+
+@dataclass
+class TenantCompute:
+    tenant_id: TenantId
+    timeline_id: TimelineId
+    pg: Postgres
+
+
+class MultiTenantNeonCompare(NeonCompare):
+    """
+    PgCompare interface for the neon stack with `n_tenants` tenants on one pageserver,
+    each with its own compute. `pg` is the compute of the first tenant; use
+    `run_concurrently` to run a workload on the computes of all tenants at once.
+    """
+
+    def __init__(
+        self,
+        zenbenchmark: NeonBenchmarker,
+        neon_env: NeonEnv,
+        pg_bin: PgBin,
+        branch_name: str,
+        n_tenants: int,
+    ):
+        super().__init__(zenbenchmark, neon_env, pg_bin, branch_name)
+        self.tenants = [TenantCompute(self.tenant, TimelineId(self.timeline), self._pg)]
+        for _ in range(n_tenants - 1):
+            tenant_id, timeline_id = self.env.neon_cli.create_tenant()
+            pg = self.env.postgres.create_start(DEFAULT_BRANCH_NAME, tenant_id=tenant_id)
+            self.tenants.append(TenantCompute(tenant_id, timeline_id, pg))
+        self.zenbenchmark.record("n_tenants", n_tenants, "", MetricReport.TEST_PARAM)
+
+    def run_concurrently(self, name: str, workload: Callable[[TenantCompute], T]) -> List[T]:
+        """
+        Run `workload` for all tenants at once, each in its own thread, and return
+        the results in the order of `tenants`.
+
+        Records the wall clock duration of the whole run, the durations of the
+        fastest, median and slowest tenant, and Jain's fairness index of the
+        tenants' throughput (the inverse of their durations).
+        """
+        # start all the workloads at the same time, after the threads are spawned
+        barrier = threading.Barrier(len(self.tenants))
+
+        def run(tenant: TenantCompute) -> Tuple[T, float]:
+            barrier.wait()
+            start = timeit.default_timer()
+            result = workload(tenant)
+            return result, timeit.default_timer() - start
+
+        with self.record_duration(f"{name}.total_duration"):
+            with ThreadPoolExecutor(max_workers=len(self.tenants)) as executor:
+                results = list(executor.map(run, self.tenants))
+
+        durations = [duration for _, duration in results]
+        for stat, value in (
+            ("min", min(durations)),
+            ("median", statistics.median(durations)),
+            ("max", max(durations)),
+        ):
+            self.zenbenchmark.record(
+                f"{name}.tenant_duration_{stat}", value, "s", MetricReport.LOWER_IS_BETTER
+            )
         self.zenbenchmark.record(
-            "data_uploaded", total_bytes / (1024 * 1024), "MB", report=MetricReport.LOWER_IS_BETTER
+            f"{name}.tenant_fairness",
+            jain_fairness_index([1 / d for d in durations if d > 0]),
+            "",
+            MetricReport.HIGHER_IS_BETTER,
+        )
+        return [result for result, _ in results]
+
+    def flush(self):
+        for tenant in self.tenants:
+            self.pageserver_http_client.timeline_gc(tenant.tenant_id, tenant.timeline_id, 0)
+
+    def compact(self):
+        for tenant in self.tenants:
+            self.pageserver_http_client.timeline_compact(tenant.tenant_id, tenant.timeline_id)
+
+    def report_size(self):
+        super().report_size()
+        total_size = sum(
+            TimelineLayers.from_dir(
+                self.env.timeline_dir(tenant.tenant_id, tenant.timeline_id)
+            ).layer_bytes
+            for tenant in self.tenants
         )
         self.zenbenchmark.record(
-            "num_files_uploaded", total_files, "", report=MetricReport.LOWER_IS_BETTER
+            "total_size", total_size / (1024 * 1024), "MB", report=MetricReport.LOWER_IS_BETTER
         )
 
-    def record_pageserver_writes(self, out_name: str) -> _GeneratorContextManager[None]:
-        return self.zenbenchmark.record_pageserver_writes(self.env.pageserver, out_name)
 
-    def record_duration(self, out_name: str) -> _GeneratorContextManager[None]:
-        return self.zenbenchmark.record_duration(out_name)
+@dataclass(frozen=True)
+class SafekeeperTopology:
+    """How many safekeepers a Neon env has, and how they are configured"""
+
+    num_safekeepers: int
+    fsync: bool
+    auth: bool
+
+    def __str__(self) -> str:
+        fsync = "on" if self.fsync else "off"
+        auth = "on" if self.auth else "off"
+        return f"{self.num_safekeepers}_safekeepers-fsync_{fsync}-auth_{auth}"
+
+    def param(self) -> Any:
+        """A pytest param of this topology. All but the default ones are slow."""
+        is_default = self.num_safekeepers == 1 and not self.auth
+        return pytest.param(self, id=str(self), marks=() if is_default else pytest.mark.slow)
+
+
+# There's no topology without safekeepers: the compute commits synchronously to the
+# pageserver, which only streams the WAL from the safekeepers.
+SAFEKEEPER_TOPOLOGIES = [
+    SafekeeperTopology(num_safekeepers, fsync, auth)
+    for num_safekeepers in (1, 3, 5)
+    for fsync in (False, True)
+    for auth in (False, True)
+]
+
+
+class SafekeeperNeonCompare(NeonCompare):
+    """PgCompare interface for the neon stack with the given safekeeper topology."""
+
+    def __init__(
+        self,
+        zenbenchmark: NeonBenchmarker,
+        neon_env_builder: NeonEnvBuilder,
+        pg_bin: PgBin,
+        branch_name: str,
+        topology: SafekeeperTopology,
+    ):
+        neon_env_builder.num_safekeepers = topology.num_safekeepers
+        neon_env_builder.safekeepers_enable_fsync = topology.fsync
+        neon_env_builder.auth_enabled = topology.auth
+        env = neon_env_builder.init_start()
+        env.neon_cli.create_branch("empty", ancestor_branch_name=DEFAULT_BRANCH_NAME)
+        super().__init__(zenbenchmark, env, pg_bin, branch_name)
+
+        self.topology = topology
+        zenbenchmark.record(
+            "num_safekeepers", topology.num_safekeepers, "", MetricReport.TEST_PARAM
+        )
+        zenbenchmark.record("safekeepers_fsync", int(topology.fsync), "", MetricReport.TEST_PARAM)
+        zenbenchmark.record("auth", int(topology.auth), "", MetricReport.TEST_PARAM)
 
 
 class VanillaCompare(PgCompare):
     """PgCompare interface for vanilla postgres."""
 
-    def __init__(self, zenbenchmark: NeonBenchmarker, vanilla_pg: VanillaPostgres):
+    def __init__(
+        self,
+        zenbenchmark: NeonBenchmarker,
+        vanilla_pg: VanillaPostgres,
+        config_lines: Optional[List[str]] = None,
+    ):
         self._pg = vanilla_pg
         self._zenbenchmark = zenbenchmark
+        # config_lines go last to override the defaults
         vanilla_pg.configure(
             [
                 "shared_buffers=1MB",
                 "synchronous_commit=off",
             ]
+            + (config_lines or [])
         )
         vanilla_pg.start()
 
@@ -193,6 +543,9 @@ class VanillaCompare(PgCompare):
     def report_peak_memory_use(self):
         pass  # TODO find something
 
+    def processes(self) -> ProcessFinder:
+        return vanilla_processes(self._pg)
+
     def report_size(self):
         data_size = self.pg.get_subdir_size("base")
         self.zenbenchmark.record(
@@ -212,16 +565,40 @@ class VanillaCompare(PgCompare):
 
 
 class RemoteCompare(PgCompare):
-    """PgCompare interface for a remote postgres instance."""
+    """
+    PgCompare interface for a remote postgres instance.
 
-    def __init__(self, zenbenchmark: NeonBenchmarker, remote_pg: RemotePostgres):
+    If the HTTP API of the pageserver behind it is reachable, pass its client and
+    the pageserver metrics are recorded like with NeonCompare. The tenant and timeline
+    default to the ones the compute is attached to.
+    """
+
+    def __init__(
+        self,
+        zenbenchmark: NeonBenchmarker,
+        remote_pg: RemotePostgres,
+        pageserver_http_client: Optional[PageserverHttpClient] = None,
+        tenant_id: Optional[TenantId] = None,
+        timeline_id: Optional[TimelineId] = None,
+    ):
         self._pg = remote_pg
         self._zenbenchmark = zenbenchmark
+        self.pageserver_http_client = pageserver_http_client
 
         # Long-lived cursor, useful for flushing
         self.conn = self.pg.connect()
         self.cur = self.conn.cursor()
 
+        if pageserver_http_client is not None:
+            if tenant_id is None:
+                tenant_id = TenantId(self.pg.safe_psql("SHOW neon.tenant_id")[0][0])
+            if timeline_id is None:
+                timeline_id = TimelineId(self.pg.safe_psql("SHOW neon.timeline_id")[0][0])
+        self.tenant_id = tenant_id
+        self.timeline_id = timeline_id
+        # GC is only available if the pageserver was built with the 'testing' feature
+        self._can_gc = True
+
     @property
     def pg(self) -> PgProtocol:
         return self._pg
@@ -235,20 +612,60 @@ class RemoteCompare(PgCompare):
         return self._pg.pg_bin
 
     def flush(self):
-        # TODO: flush the remote pageserver
-        pass
+        if self.pageserver_http_client is None or not self._can_gc:
+            return
+        assert self.tenant_id is not None and self.timeline_id is not None
+        try:
+            self.pageserver_http_client.timeline_gc(self.tenant_id, self.timeline_id, 0)
+        except PageserverApiException as e:
+            log.warning(f"cannot flush the remote pageserver, not flushing anymore: {e}")
+            self._can_gc = False
 
     def report_peak_memory_use(self):
-        # TODO: get memory usage from remote pageserver
-        pass
+        if self.pageserver_http_client is None:
+            return
+        self.zenbenchmark.record(
+            "peak_mem",
+            self.zenbenchmark.get_peak_mem(self.pageserver_http_client) / 1024,
+            "MB",
+            report=MetricReport.LOWER_IS_BETTER,
+        )
 
     def report_size(self):
-        # TODO: get storage size from remote pageserver
-        pass
+        if self.pageserver_http_client is None:
+            return
+        assert self.tenant_id is not None and self.timeline_id is not None
+        detail = self.pageserver_http_client.timeline_detail(self.tenant_id, self.timeline_id)
+        self.zenbenchmark.record(
+            "size",
+            detail["current_physical_size"] / (1024 * 1024),
+            "MB",
+            report=MetricReport.LOWER_IS_BETTER,
+        )
+        self.zenbenchmark.record_data_uploaded(
+            self.pageserver_http_client, self.tenant_id, self.timeline_id
+        )
 
     @contextmanager
     def record_pageserver_writes(self, out_name: str) -> Iterator[None]:
-        yield  # Do nothing
+        if self.pageserver_http_client is None:
+            yield
+            return
+        with self.zenbenchmark.record_pageserver_writes(self.pageserver_http_client, out_name):
+            yield
+
+    @contextmanager
+    def record_metrics_delta(self, prefix: str) -> Iterator[None]:
+        if self.pageserver_http_client is None:
+            yield
+            return
+        with self.zenbenchmark.record_metrics_delta(self.pageserver_http_client, prefix):
+            yield
+
+    def metrics_endpoints(self) -> Dict[str, MetricsEndpoint]:
+        if self.pageserver_http_client is None:
+            return {}
+        return pageserver_metrics_endpoints(self.pageserver_http_client)
 
     def record_duration(self, out_name: str) -> _GeneratorContextManager[None]:
         return self.zenbenchmark.record_duration(out_name)
@@ -260,19 +677,206 @@ def neon_compare(
     zenbenchmark: NeonBenchmarker,
     pg_bin: PgBin,
     neon_simple_env: NeonEnv,
+    compute_config: Dict[str, str],
 ) -> NeonCompare:
     branch_name = request.node.name
-    return NeonCompare(zenbenchmark, neon_simple_env, pg_bin, branch_name)
+    return NeonCompare(
+        zenbenchmark,
+        neon_simple_env,
+        pg_bin,
+        branch_name,
+        config_lines=compute_config_lines(compute_config),
+    )
+
+
+@pytest.fixture(
+    scope="function",
+    params=[
+        pytest.param(1, id="1_tenants"),
+        pytest.param(4, id="4_tenants"),
+        pytest.param(16, id="16_tenants", marks=pytest.mark.slow),
+        pytest.param(64, id="64_tenants", marks=pytest.mark.slow),
+    ],
+)
+def multi_tenant_neon_compare(
+    request: FixtureRequest,
+    zenbenchmark: NeonBenchmarker,
+    pg_bin: PgBin,
+    neon_env_builder: NeonEnvBuilder,
+) -> MultiTenantNeonCompare:
+    """A MultiTenantNeonCompare, parametrized by the number of tenants"""
+    env = neon_env_builder.init_start()
+    env.neon_cli.create_branch("empty", DEFAULT_BRANCH_NAME)
+    n_tenants = request.param  # type: ignore
+    return MultiTenantNeonCompare(zenbenchmark, env, pg_bin, "multi_tenant", n_tenants)
+
+
+# Compute settings that vanilla postgres doesn't know, VanillaCompare skips them
+NEON_ONLY_COMPUTE_SETTINGS = ("enable_seqscan_prefetch", "seqscan_prefetch_buffers")
+
+
+def is_neon_only_compute_setting(name: str) -> bool:
+    return name.startswith("neon.") or name in NEON_ONLY_COMPUTE_SETTINGS
+
+
+def pytest_configure(config: Config):
+    config.addinivalue_line(
+        "markers",
+        "neon_config_matrix(**settings): tenant config values to run the test with, "
+        "see the neon_config_matrix fixture",
+    )
+    config.addinivalue_line(
+        "markers",
+        "compute_config(**settings): postgresql.conf values to run the test with, "
+        "see the compute_config fixture",
+    )
+
+
+def _parametrize_config_matrix(metafunc: Metafunc, name: str):
+    """
+    Parametrize the `name` fixture with every combination of the values listed
+    in the `name` marker, as {setting: value} dicts.
+    """
+    marker = metafunc.definition.get_closest_marker(name)
+    if marker is None:
+        return
+
+    settings: Mapping[str, List[Any]] = marker.kwargs
+    names = sorted(settings)
+    combinations = [
+        {name: str(value) for name, value in zip(names, values)}
+        for values in itertools.product(*(settings[name] for name in names))
+    ]
+    metafunc.parametrize(
+        name,
+        combinations,
+        ids=["-".join(f"{k}={v}" for k, v in conf.items()) for conf in combinations],
+        indirect=True,
+    )
+
+
+def pytest_generate_tests(metafunc: Metafunc):
+    if "neon_config_matrix" in metafunc.fixturenames:
+        assert metafunc.definition.get_closest_marker(
+            "neon_config_matrix"
+        ), "neon_config_matrix fixture requires a neon_config_matrix marker"
+        _parametrize_config_matrix(metafunc, "neon_config_matrix")
+    if "compute_config" in metafunc.fixturenames:
+        _parametrize_config_matrix(metafunc, "compute_config")
 
 
 @pytest.fixture(scope="function")
-def vanilla_compare(zenbenchmark: NeonBenchmarker, vanilla_pg: VanillaPostgres) -> VanillaCompare:
-    return VanillaCompare(zenbenchmark, vanilla_pg)
+def compute_config(request: FixtureRequest, zenbenchmark: NeonBenchmarker) -> Dict[str, str]:
+    """
+    postgresql.conf settings for the computes of neon_compare, vanilla_compare and
+    neon_with_baseline. Empty by default; with a compute_config marker, the test
+    runs for every combination of the listed values, e.g. to get a cache size curve:
+
+    >>> @pytest.mark.compute_config(shared_buffers=["1MB", "128MB"], effective_io_concurrency=[1, 32])
+    ... def test_mybench(neon_with_baseline: PgCompare, compute_config: Dict[str, str]):
+    ...     ...
+
+    The test has to request this fixture itself, or the marker is ignored. The
+    combination is a part of the test id, and every metric is tagged with it.
+    Settings only Neon has (see is_neon_only_compute_setting) are not applied to
+    vanilla postgres.
+    """
+    config: Dict[str, str] = getattr(request, "param", {})
+    if config:
+        zenbenchmark.tags["compute_config"] = config
+    return config
+
+
+def compute_config_lines(config: Dict[str, str], vanilla: bool = False) -> List[str]:
+    return [
+        f"{name}={value}"
+        for name, value in config.items()
+        if not (vanilla and is_neon_only_compute_setting(name))
+    ]
 
 
 @pytest.fixture(scope="function")
-def remote_compare(zenbenchmark: NeonBenchmarker, remote_pg: RemotePostgres) -> RemoteCompare:
-    return RemoteCompare(zenbenchmark, remote_pg)
+def neon_config_matrix(
+    request: FixtureRequest,
+    zenbenchmark: NeonBenchmarker,
+    pg_bin: PgBin,
+    neon_simple_env: NeonEnv,
+) -> NeonCompare:
+    """
+    NeonCompare on a tenant created with one combination of tenant config values.
+    The test runs for every combination of the values in its neon_config_matrix marker,
+    e.g.:
+
+    >>> @pytest.mark.neon_config_matrix(checkpoint_distance=[8192, 1024 ** 2], gc_period=["0s"])
+    ... def test_mybench(neon_config_matrix: NeonCompare):
+    ...     ...
+
+    The combination is a part of the test id, and every metric is tagged with it.
+    """
+    tenant_conf: Dict[str, str] = request.param  # type: ignore
+    tenant_id, _ = neon_simple_env.neon_cli.create_tenant(conf=tenant_conf)
+    zenbenchmark.tags["tenant_conf"] = tenant_conf
+    return NeonCompare(
+        zenbenchmark, neon_simple_env, pg_bin, request.node.name, tenant_id=tenant_id
+    )
+
+
+@pytest.fixture(scope="function", params=[topology.param() for topology in SAFEKEEPER_TOPOLOGIES])
+def safekeepers_compare(
+    request: FixtureRequest,
+    zenbenchmark: NeonBenchmarker,
+    pg_bin: PgBin,
+    neon_env_builder: NeonEnvBuilder,
+) -> SafekeeperNeonCompare:
+    """
+    A SafekeeperNeonCompare, parametrized by SAFEKEEPER_TOPOLOGIES. Only one
+    safekeeper without auth runs by default, the rest of them are slow.
+    """
+    topology: SafekeeperTopology = request.param  # type: ignore
+    return SafekeeperNeonCompare(
+        zenbenchmark, neon_env_builder, pg_bin, request.node.name, topology
+    )
+
+
+@pytest.fixture(scope="function")
+def vanilla_compare(
+    zenbenchmark: NeonBenchmarker, vanilla_pg: VanillaPostgres, compute_config: Dict[str, str]
+) -> VanillaCompare:
+    return VanillaCompare(
+        zenbenchmark, vanilla_pg, config_lines=compute_config_lines(compute_config, vanilla=True)
+    )
+
+
+@pytest.fixture(scope="function")
+def remote_compare(
+    zenbenchmark: NeonBenchmarker, remote_pg: RemotePostgres, compute_config: Dict[str, str]
+) -> RemoteCompare:
+    """
+    The pageserver metrics are only recorded if BENCHMARK_PAGESERVER_HTTP is set to the
+    host:port of its HTTP API. BENCHMARK_PAGESERVER_AUTH_TOKEN, BENCHMARK_TENANT_ID and
+    BENCHMARK_TIMELINE_ID are optional.
+    """
+    if compute_config:
+        pytest.skip("compute config of a remote cluster can't be changed")
+    pageserver_http_client = None
+    if pageserver_http := os.getenv("BENCHMARK_PAGESERVER_HTTP"):
+        host, _, port = pageserver_http.rpartition(":")
+        pageserver_http_client = PageserverHttpClient(
+            port=int(port),
+            # the remote pageserver is not ours to skip tests for, just try
+            is_testing_enabled_or_skip=lambda: None,
+            auth_token=os.getenv("BENCHMARK_PAGESERVER_AUTH_TOKEN"),
+            host=host,
+        )
+    tenant_id = os.getenv("BENCHMARK_TENANT_ID")
+    timeline_id = os.getenv("BENCHMARK_TIMELINE_ID")
+    return RemoteCompare(
+        zenbenchmark,
+        remote_pg,
+        pageserver_http_client,
+        tenant_id=TenantId(tenant_id) if tenant_id else None,
+        timeline_id=TimelineId(timeline_id) if timeline_id else None,
+    )
 
 
 @pytest.fixture(params=["vanilla_compare", "neon_compare"], ids=["vanilla", "neon"])
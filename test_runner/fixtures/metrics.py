@@ -1,44 +1,154 @@
+import math
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from typing import DefaultDict, Dict, FrozenSet, List, Optional, Tuple
 
 from prometheus_client.parser import text_string_to_metric_families
 from prometheus_client.samples import Sample
 
+# Labels of a sample in a hashable form
+LabelSet = FrozenSet[Tuple[str, str]]
+
 
 class Metrics:
+    """
+    Samples of a /metrics scrape, by metric name. Besides the list of samples of
+    each metric, the samples are indexed by their whole label set, and by each of
+    their label values, so that queries don't have to scan all the samples of a
+    metric, which are many with many tenants.
+    """
+
     metrics: Dict[str, List[Sample]]
     name: str
 
     def __init__(self, name: str = ""):
         self.metrics = defaultdict(list)
         self.name = name
+        # metric name -> label set -> samples
+        self._by_labels: DefaultDict[str, Dict[LabelSet, List[Sample]]] = defaultdict(dict)
+        # metric name -> (label, value) -> samples
+        self._by_label_value: DefaultDict[str, Dict[Tuple[str, str], List[Sample]]] = defaultdict(
+            dict
+        )
+
+    def add_sample(self, sample: Sample):
+        self.metrics[sample.name].append(sample)
+        labels = sample.labels.items()
+        self._by_labels[sample.name].setdefault(frozenset(labels), []).append(sample)
+        by_label_value = self._by_label_value[sample.name]
+        for label_value in labels:
+            by_label_value.setdefault(label_value, []).append(sample)
 
     def query_all(self, name: str, filter: Dict[str, str]) -> List[Sample]:
-        res = []
-        for sample in self.metrics[name]:
-            try:
-                if all(sample.labels[k] == v for k, v in filter.items()):
-                    res.append(sample)
-            except KeyError:
-                pass
-        return res
+        """Samples of `name` that have all the labels of `filter`, in scrape order"""
+        if not filter:
+            return list(self.metrics.get(name, []))
+
+        by_label_value = self._by_label_value.get(name, {})
+        candidates = [by_label_value.get(label_value, []) for label_value in filter.items()]
+        # check the other labels on the samples with the rarest one
+        smallest = min(candidates, key=len)
+        if len(candidates) == 1:
+            return list(smallest)
+        return [
+            sample
+            for sample in smallest
+            if all(sample.labels.get(k) == v for k, v in filter.items())
+        ]
 
     def query_one(self, name: str, filter: Optional[Dict[str, str]] = None) -> Sample:
         res = self.query_all(name, filter or {})
         assert len(res) == 1, f"expected single sample for {name} {filter}, found {res}"
         return res[0]
 
+    def query_exact(self, name: str, labels: Dict[str, str]) -> Optional[Sample]:
+        """The sample of `name` with exactly `labels`, e.g. the same series in another scrape"""
+        samples = self._by_labels.get(name, {}).get(frozenset(labels.items()))
+        return samples[0] if samples else None
+
 
 def parse_metrics(text: str, name: str = "") -> Metrics:
     metrics = Metrics(name)
     gen = text_string_to_metric_families(text)
     for family in gen:
         for sample in family.samples:
-            metrics.metrics[sample.name].append(sample)
+            metrics.add_sample(sample)
 
     return metrics
 
 
+@dataclass
+class Histogram:
+    """
+    A Prometheus histogram, summed over all the label sets that match a filter,
+    e.g. all tenants. `buckets` are (upper bound, cumulative count) pairs sorted
+    by the bound, the last bound is +Inf.
+    """
+
+    buckets: List[Tuple[float, float]]
+    sum: float
+    count: float
+
+    @classmethod
+    def from_metrics(
+        cls, metrics: Metrics, name: str, filter: Optional[Dict[str, str]] = None
+    ) -> "Histogram":
+        """
+        Collect the `{name}_bucket`, `{name}_sum` and `{name}_count` samples of the
+        histogram `name`, e.g. "pageserver_smgr_query_seconds" with
+        {"smgr_query_type": "get_page_at_lsn"}.
+        """
+        filter = filter or {}
+        buckets: DefaultDict[float, float] = defaultdict(float)
+        for sample in metrics.query_all(f"{name}_bucket", filter):
+            buckets[float(sample.labels["le"])] += sample.value
+        return cls(
+            buckets=sorted(buckets.items()),
+            sum=sum(sample.value for sample in metrics.query_all(f"{name}_sum", filter)),
+            count=sum(sample.value for sample in metrics.query_all(f"{name}_count", filter)),
+        )
+
+    def __sub__(self, other: "Histogram") -> "Histogram":
+        """The observations made between two scrapes: `after - before`"""
+        before = dict(other.buckets)
+        # a histogram that had no observations before has no buckets at all
+        assert not before or before.keys() == dict(self.buckets).keys(), "bucket bounds differ"
+        return Histogram(
+            buckets=[(bound, count - before.get(bound, 0.0)) for bound, count in self.buckets],
+            sum=self.sum - other.sum,
+            count=self.count - other.count,
+        )
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the `q` quantile, like Prometheus' histogram_quantile(): find the
+        bucket of the observation and interpolate linearly within it, assuming the
+        observations are spread evenly. Observations in the +Inf bucket are
+        estimated as the highest finite bound.
+        """
+        assert 0 <= q <= 1, f"quantile {q} is not in [0, 1]"
+        if not self.buckets or self.buckets[-1][1] <= 0:
+            return None
+
+        rank = q * self.buckets[-1][1]
+        lower_bound, lower_count = 0.0, 0.0
+        for bound, count in self.buckets:
+            if count >= rank:
+                if math.isinf(bound):
+                    return lower_bound
+                if count == lower_count:
+                    return bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / (
+                    count - lower_count
+                )
+            lower_bound, lower_count = bound, count
+        return lower_bound
+
+
 PAGESERVER_PER_TENANT_METRICS: Tuple[str, ...] = (
     "pageserver_current_logical_size",
     "pageserver_current_physical_size",
@@ -0,0 +1,226 @@
+import csv
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pytest
+from fixtures.log_helper import log
+from fixtures.neon_fixtures import NeonEnv, NeonProxy, PageserverHttpClient
+from prometheus_client.parser import text_string_to_metric_families
+
+"""
+This file contains a fixture that scrapes the /metrics endpoints of Neon services
+in a background thread, to see how the metrics change over time, e.g.:
+
+>>> def test_mybench(neon_simple_env: NeonEnv, metrics_scraper):
+...     env = neon_simple_env
+...     with metrics_scraper.scrape(neon_env_metrics_endpoints(env)):
+...         run_workload()
+...     flushes = metrics_scraper.series("pageserver", "pageserver_layers_flushed_total")
+
+Each series is stored as two arrays of timestamps and values, keyed by the
+endpoint, the metric name and its labels. The time series of all scraped metrics
+are saved as `metrics_timeseries.csv` in the test output directory.
+"""
+
+# Returns the text of a /metrics endpoint
+MetricsEndpoint = Callable[[], str]
+
+# (label, value) pairs, sorted by label
+Labels = Tuple[Tuple[str, str], ...]
+
+# endpoint, metric name, labels
+SeriesKey = Tuple[str, str, Labels]
+
+CSV_COLUMNS = ("timestamp", "endpoint", "name", "labels", "value")
+
+
+def neon_env_metrics_endpoints(
+    env: NeonEnv, proxy: Optional[NeonProxy] = None
+) -> Dict[str, MetricsEndpoint]:
+    """The pageserver and safekeepers of `env`, and `proxy` if it's given"""
+    endpoints: Dict[str, MetricsEndpoint] = {"pageserver": env.pageserver.http_client().get_metrics}
+    for sk in env.safekeepers:
+        endpoints[f"safekeeper{sk.id}"] = sk.http_client().get_metrics_str
+    if proxy is not None:
+        endpoints["proxy"] = proxy.get_metrics
+    return endpoints
+
+
+def pageserver_metrics_endpoints(client: PageserverHttpClient) -> Dict[str, MetricsEndpoint]:
+    """Just a pageserver, e.g. a remote one"""
+    return {"pageserver": client.get_metrics}
+
+
+@dataclass
+class TimeSeries:
+    timestamps: "array[float]" = field(default_factory=lambda: array("d"))
+    values: "array[float]" = field(default_factory=lambda: array("d"))
+
+    def append(self, timestamp: float, value: float):
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+    def copy(self) -> "TimeSeries":
+        return TimeSeries(array("d", self.timestamps), array("d", self.values))
+
+    def derivative(self) -> List[Tuple[float, float]]:
+        """Per-second change of a gauge between consecutive samples, at the later one"""
+        return [
+            (self.timestamps[i], (self.values[i] - self.values[i - 1]) / dt)
+            for i in range(1, len(self.values))
+            if (dt := self.timestamps[i] - self.timestamps[i - 1]) > 0
+        ]
+
+    def rate(self) -> List[Tuple[float, float]]:
+        """
+        Per-second increase of a counter between consecutive samples, at the later
+        one. Like in Prometheus, a decrease means that the counter was reset, e.g.
+        by a restart, and it has counted from zero since.
+        """
+        result = []
+        for i in range(1, len(self.values)):
+            dt = self.timestamps[i] - self.timestamps[i - 1]
+            if dt <= 0:
+                continue
+            increase = self.values[i] - self.values[i - 1]
+            if increase < 0:
+                increase = self.values[i]
+            result.append((self.timestamps[i], increase / dt))
+        return result
+
+
+class MetricsScraper:
+    """
+    Periodically scrapes a set of /metrics endpoints into a time series store,
+    see the module docstring for usage.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        interval: float = 1.0,
+        metric_names: Optional[Iterable[str]] = None,
+    ):
+        self.output_dir = output_dir
+        self.interval = interval
+        # only keep these metrics, or all of them if None
+        self.metric_names = None if metric_names is None else frozenset(metric_names)
+        self.store: Dict[SeriesKey, TimeSeries] = {}
+        self._labels: Dict[Labels, Labels] = {}
+        # guards the store, which the scraper thread appends to
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _intern_labels(self, labels: Dict[str, str]) -> Labels:
+        # Every scrape returns the same label sets, keep only one copy of each
+        key = tuple(sorted((sys.intern(k), sys.intern(v)) for k, v in labels.items()))
+        return self._labels.setdefault(key, key)
+
+    def _add_scrape(self, endpoint: str, timestamp: float, text: str):
+        samples = [
+            sample
+            for family in text_string_to_metric_families(text)
+            for sample in family.samples
+            if self.metric_names is None or sample.name in self.metric_names
+        ]
+        with self._lock:
+            for sample in samples:
+                key = (endpoint, sys.intern(sample.name), self._intern_labels(sample.labels))
+                series = self.store.get(key)
+                if series is None:
+                    series = self.store[key] = TimeSeries()
+                series.append(timestamp, sample.value)
+
+    def _run(self, endpoints: Dict[str, MetricsEndpoint]):
+        while not self._stop.is_set():
+            started_at = time.time()
+            for endpoint, get_metrics in endpoints.items():
+                try:
+                    text = get_metrics()
+                except Exception as e:
+                    # e.g. the service is being restarted
+                    log.warning(f"metrics scraper failed to scrape {endpoint}: {e}")
+                    continue
+                self._add_scrape(endpoint, time.time(), text)
+            self._stop.wait(max(0.0, self.interval - (time.time() - started_at)))
+
+    def start(self, endpoints: Dict[str, MetricsEndpoint]):
+        assert self._thread is None, "metrics scraper is already running"
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(endpoints,), name="metrics-scraper", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.save()
+
+    @contextmanager
+    def scrape(self, endpoints: Dict[str, MetricsEndpoint]) -> Iterator[None]:
+        self.start(endpoints)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def series(
+        self, endpoint: str, name: str, labels: Optional[Dict[str, str]] = None
+    ) -> TimeSeries:
+        """A copy of the series with exactly `labels`, empty if it was never scraped"""
+        key = (endpoint, name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            series = self.store.get(key)
+            return TimeSeries() if series is None else series.copy()
+
+    def query(
+        self, endpoint: str, name: str, filter: Optional[Dict[str, str]] = None
+    ) -> Dict[Labels, TimeSeries]:
+        """Copies of all the series of `name` that have the labels of `filter`, by their labels"""
+        filter_items = (filter or {}).items()
+        with self._lock:
+            return {
+                labels: series.copy()
+                for (series_endpoint, series_name, labels), series in self.store.items()
+                if series_endpoint == endpoint
+                and series_name == name
+                and filter_items <= dict(labels).items()
+            }
+
+    def save(self) -> Path:
+        """Write all the time series into a csv file, one row per sample"""
+        path = self.output_dir / "metrics_timeseries.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            with self._lock:
+                store = {key: series.copy() for key, series in self.store.items()}
+            for (endpoint, name, labels), series in sorted(store.items()):
+                labels_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                for timestamp, value in zip(series.timestamps, series.values):
+                    writer.writerow((f"{timestamp:.3f}", endpoint, name, labels_str, value))
+        return path
+
+
+@pytest.fixture(scope="function")
+def metrics_scraper(test_output_dir: Path) -> Iterator[MetricsScraper]:
+    """
+    A background scraper of /metrics endpoints. The interval can be set with the
+    METRICS_SCRAPER_INTERVAL environment variable, in seconds, 1 by default.
+    """
+    interval = float(os.getenv("METRICS_SCRAPER_INTERVAL", "1.0"))
+    scraper = MetricsScraper(test_output_dir, interval=interval)
+    yield scraper
+    scraper.stop()
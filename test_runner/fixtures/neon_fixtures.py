@@ -33,7 +33,13 @@ from _pytest.config import Config
 from _pytest.fixtures import FixtureRequest
 from fixtures.log_helper import log
 from fixtures.types import Lsn, TenantId, TimelineId
-from fixtures.utils import Fn, allure_attach_from_dir, get_self_dir, subprocess_capture
+from fixtures.utils import (
+    Fn,
+    allure_attach_from_dir,
+    get_dir_size,
+    get_self_dir,
+    subprocess_capture,
+)
 
 # Type-related stuff
 from psycopg2.extensions import connection as PgConnection
@@ -193,16 +199,6 @@ def worker_base_port(worker_seq_no: int) -> int:
     return BASE_PORT + worker_seq_no * WORKER_PORT_NUM
 
 
-def get_dir_size(path: str) -> int:
-    """Return size in bytes."""
-    totalbytes = 0
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            totalbytes += os.path.getsize(os.path.join(root, name))
-
-    return totalbytes
-
-
 def can_bind(host: str, port: int) -> bool:
     """
     Check whether a host:port is available to bind for listening
@@ -1050,8 +1046,15 @@ class PageserverApiException(Exception):
 
 
 class PageserverHttpClient(requests.Session):
-    def __init__(self, port: int, is_testing_enabled_or_skip: Fn, auth_token: Optional[str] = None):
+    def __init__(
+        self,
+        port: int,
+        is_testing_enabled_or_skip: Fn,
+        auth_token: Optional[str] = None,
+        host: str = "localhost",
+    ):
         super().__init__()
+        self.host = host
         self.port = port
         self.auth_token = auth_token
         self.is_testing_enabled_or_skip = is_testing_enabled_or_skip
@@ -1070,7 +1073,7 @@ class PageserverHttpClient(requests.Session):
             raise PageserverApiException(msg) from e
 
     def check_status(self):
-        self.get(f"http://localhost:{self.port}/v1/status").raise_for_status()
+        self.get(f"http://{self.host}:{self.port}/v1/status").raise_for_status()
 
     def configure_failpoints(self, config_strings: Tuple[str, str] | List[Tuple[str, str]]):
         self.is_testing_enabled_or_skip()
@@ -1083,7 +1086,7 @@ class PageserverHttpClient(requests.Session):
         log.info(f"Requesting config failpoints: {repr(pairs)}")
 
         res = self.put(
-            f"http://localhost:{self.port}/v1/failpoints",
+            f"http://{self.host}:{self.port}/v1/failpoints",
             json=[{"name": name, "actions": actions} for name, actions in pairs],
         )
         log.info(f"Got failpoints request response code {res.status_code}")
@@ -1093,7 +1096,7 @@ class PageserverHttpClient(requests.Session):
         return res_json
 
     def tenant_list(self) -> List[Dict[Any, Any]]:
-        res = self.get(f"http://localhost:{self.port}/v1/tenant")
+        res = self.get(f"http://{self.host}:{self.port}/v1/tenant")
         self.verbose_error(res)
         res_json = res.json()
         assert isinstance(res_json, list)
@@ -1101,7 +1104,7 @@ class PageserverHttpClient(requests.Session):
 
     def tenant_create(self, new_tenant_id: Optional[TenantId] = None) -> TenantId:
         res = self.post(
-            f"http://localhost:{self.port}/v1/tenant",
+            f"http://{self.host}:{self.port}/v1/tenant",
             json={
                 "new_tenant_id": str(new_tenant_id) if new_tenant_id else None,
             },
@@ -1114,23 +1117,23 @@ class PageserverHttpClient(requests.Session):
         return TenantId(new_tenant_id)
 
     def tenant_attach(self, tenant_id: TenantId):
-        res = self.post(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/attach")
+        res = self.post(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/attach")
         self.verbose_error(res)
 
     def tenant_detach(self, tenant_id: TenantId):
-        res = self.post(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/detach")
+        res = self.post(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/detach")
         self.verbose_error(res)
 
     def tenant_load(self, tenant_id: TenantId):
-        res = self.post(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/load")
+        res = self.post(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/load")
         self.verbose_error(res)
 
     def tenant_ignore(self, tenant_id: TenantId):
-        res = self.post(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/ignore")
+        res = self.post(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/ignore")
         self.verbose_error(res)
 
     def tenant_status(self, tenant_id: TenantId) -> Dict[Any, Any]:
-        res = self.get(f"http://localhost:{self.port}/v1/tenant/{tenant_id}")
+        res = self.get(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}")
         self.verbose_error(res)
         res_json = res.json()
         assert isinstance(res_json, dict)
@@ -1140,7 +1143,7 @@ class PageserverHttpClient(requests.Session):
         """
         Returns the tenant size, together with the model inputs as the second tuple item.
         """
-        res = self.get(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/size")
+        res = self.get(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/size")
         self.verbose_error(res)
         res = res.json()
         assert isinstance(res, dict)
@@ -1152,7 +1155,7 @@ class PageserverHttpClient(requests.Session):
         return size
 
     def timeline_list(self, tenant_id: TenantId) -> List[Dict[str, Any]]:
-        res = self.get(f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline")
+        res = self.get(f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline")
         self.verbose_error(res)
         res_json = res.json()
         assert isinstance(res_json, list)
@@ -1166,7 +1169,7 @@ class PageserverHttpClient(requests.Session):
         ancestor_start_lsn: Optional[Lsn] = None,
     ) -> Dict[Any, Any]:
         res = self.post(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline",
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline",
             json={
                 "new_timeline_id": str(new_timeline_id) if new_timeline_id else None,
                 "ancestor_start_lsn": str(ancestor_start_lsn) if ancestor_start_lsn else None,
@@ -1195,7 +1198,7 @@ class PageserverHttpClient(requests.Session):
             params["include-non-incremental-physical-size"] = "yes"
 
         res = self.get(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}",
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}",
             params=params,
         )
         self.verbose_error(res)
@@ -1205,7 +1208,7 @@ class PageserverHttpClient(requests.Session):
 
     def timeline_delete(self, tenant_id: TenantId, timeline_id: TimelineId):
         res = self.delete(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}"
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}"
         )
         self.verbose_error(res)
         res_json = res.json()
@@ -1220,7 +1223,7 @@ class PageserverHttpClient(requests.Session):
             f"Requesting GC: tenant {tenant_id}, timeline {timeline_id}, gc_horizon {repr(gc_horizon)}"
         )
         res = self.put(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/do_gc",
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/do_gc",
             json={"gc_horizon": gc_horizon},
         )
         log.info(f"Got GC request response code: {res.status_code}")
@@ -1235,7 +1238,7 @@ class PageserverHttpClient(requests.Session):
 
         log.info(f"Requesting compact: tenant {tenant_id}, timeline {timeline_id}")
         res = self.put(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/compact"
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/compact"
         )
         log.info(f"Got compact request response code: {res.status_code}")
         self.verbose_error(res)
@@ -1249,7 +1252,7 @@ class PageserverHttpClient(requests.Session):
             f"Requesting lsn by timestamp {timestamp}, tenant {tenant_id}, timeline {timeline_id}"
         )
         res = self.get(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/get_lsn_by_timestamp?timestamp={timestamp}",
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/get_lsn_by_timestamp?timestamp={timestamp}",
         )
         self.verbose_error(res)
         res_json = res.json()
@@ -1260,7 +1263,7 @@ class PageserverHttpClient(requests.Session):
 
         log.info(f"Requesting checkpoint: tenant {tenant_id}, timeline {timeline_id}")
         res = self.put(
-            f"http://localhost:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/checkpoint"
+            f"http://{self.host}:{self.port}/v1/tenant/{tenant_id}/timeline/{timeline_id}/checkpoint"
         )
         log.info(f"Got checkpoint request response code: {res.status_code}")
         self.verbose_error(res)
@@ -1268,7 +1271,7 @@ class PageserverHttpClient(requests.Session):
         assert res_json is None
 
     def get_metrics(self) -> str:
-        res = self.get(f"http://localhost:{self.port}/metrics")
+        res = self.get(f"http://{self.host}:{self.port}/metrics")
         self.verbose_error(res)
         return res.text
 
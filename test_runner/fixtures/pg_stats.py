@@ -1,22 +1,181 @@
+import threading
+import time
+from collections import Counter
 from functools import cached_property
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import pytest
+from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker
+from fixtures.log_helper import log
+from fixtures.neon_fixtures import PgProtocol
 
 
 class PgStatTable:
+    """
+    Counters to diff before and after a benchmark, see PgCompare.record_pg_stats.
+
+    A column can be an expression with an alias, e.g. "pg_relation_size(relid) AS size".
+    With `key_column`, the query returns a row per key, e.g. per relation, and the
+    counters are recorded for each of them as `{table}.{key}.{column}`.
+    The changes are reported as `default_report`, or as given in `reports` by column
+    name, e.g. LOWER_IS_BETTER for the blocks read from disk.
+    """
+
     table: str
     columns: List[str]
     additional_query: str
+    key_column: Optional[str]
+    reports: Dict[str, MetricReport]
+    default_report: MetricReport
 
-    def __init__(self, table: str, columns: List[str], filter_query: str = ""):
+    def __init__(
+        self,
+        table: str,
+        columns: List[str],
+        filter_query: str = "",
+        key_column: Optional[str] = None,
+        reports: Optional[Dict[str, MetricReport]] = None,
+        default_report: MetricReport = MetricReport.HIGHER_IS_BETTER,
+    ):
         self.table = table
         self.columns = columns
         self.additional_query = filter_query
+        self.key_column = key_column
+        self.reports = reports or {}
+        self.default_report = default_report
+
+    def report(self, column_name: str) -> MetricReport:
+        return self.reports.get(column_name, self.default_report)
+
+    @cached_property
+    def column_names(self) -> List[str]:
+        return [column.split(" AS ")[-1] for column in self.columns]
 
     @cached_property
     def query(self) -> str:
-        return f"SELECT {','.join(self.columns)} FROM {self.table} {self.additional_query}"
+        columns = self.columns if self.key_column is None else [self.key_column] + self.columns
+        return f"SELECT {','.join(columns)} FROM {self.table} {self.additional_query}"
+
+
+# (wait_event_type, wait_event)
+WaitEvent = Tuple[str, str]
+
+# Active backends without a wait event are either running on CPU, or waiting for
+# something that doesn't report a wait event. On Neon, that includes the GetPage
+# requests to the pageserver, so this is not the CPU time.
+NO_WAIT_EVENT: WaitEvent = ("no_wait_event", "no_wait_event")
+
+
+class WaitEventSampler:
+    """
+    Polls pg_stat_activity on a dedicated connection in a background thread, and
+    counts the wait events of active client backends, in total and per backend.
+    Each sample of a backend stands for `interval` seconds of its time, so the
+    shares of the samples show where the time went.
+    """
+
+    QUERY = """
+        SELECT pid, wait_event_type, wait_event FROM pg_stat_activity
+        WHERE state = 'active' AND backend_type = 'client backend'
+            AND pid <> pg_backend_pid()
+    """
+
+    def __init__(self, pg: PgProtocol, interval: float = 0.01):
+        self.pg = pg
+        self.interval = interval
+        self.wait_events: Counter[WaitEvent] = Counter()
+        self.by_backend: Dict[int, Counter[WaitEvent]] = {}
+        self.ticks = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _run(self):
+        with self.pg.cursor() as cur:
+            while not self._stop.is_set():
+                started_at = time.time()
+                try:
+                    cur.execute(self.QUERY)
+                    rows = cur.fetchall()
+                except Exception as e:
+                    log.warning(f"wait event sampler failed, stopping: {e}")
+                    return
+                for pid, wait_event_type, wait_event in rows:
+                    event = (wait_event_type, wait_event) if wait_event else NO_WAIT_EVENT
+                    self.wait_events[event] += 1
+                    self.by_backend.setdefault(pid, Counter())[event] += 1
+                self.ticks += 1
+                self._stop.wait(max(0.0, self.interval - (time.time() - started_at)))
+
+    def start(self):
+        assert self._thread is None, "wait event sampler is already running"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wait-event-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def report(self, zenbenchmark: NeonBenchmarker, prefix: str):
+        """
+        Record the share of the sampled backend time spent in each wait event type
+        and wait event, the largest share of a single backend for each type, and the
+        average number of active backends. The share without
+        a wait event is recorded as `{prefix}.no_wait_event`, see NO_WAIT_EVENT.
+        """
+        total = sum(self.wait_events.values())
+        if total == 0:
+            log.warning(f"no active backends were sampled for {prefix}, nothing to record")
+            return
+
+        by_type: Counter[str] = Counter()
+        for (wait_event_type, wait_event), count in sorted(self.wait_events.items()):
+            by_type[wait_event_type] += count
+            if (wait_event_type, wait_event) != NO_WAIT_EVENT:
+                zenbenchmark.record(
+                    f"{prefix}.{wait_event_type}.{wait_event}",
+                    count / total * 100,
+                    "%",
+                    MetricReport.LOWER_IS_BETTER,
+                )
+        for wait_event_type, count in sorted(by_type.items()):
+            zenbenchmark.record(
+                f"{prefix}.{wait_event_type}",
+                count / total * 100,
+                "%",
+                # neither is better, it's CPU and pageserver time
+                MetricReport.TEST_PARAM
+                if wait_event_type == NO_WAIT_EVENT[0]
+                else MetricReport.LOWER_IS_BETTER,
+            )
+        zenbenchmark.record(
+            f"{prefix}.active_backends", total / self.ticks, "", MetricReport.TEST_PARAM
+        )
+
+        # How unevenly the time of the backends is spread, e.g. when some of them
+        # queue on a lock the others hold: the largest share of a single backend.
+        backend_shares: Dict[str, List[float]] = {}
+        for backend_events in self.by_backend.values():
+            backend_total = sum(backend_events.values())
+            backend_by_type: Counter[str] = Counter()
+            for (wait_event_type, _), count in backend_events.items():
+                backend_by_type[wait_event_type] += count
+            for wait_event_type in by_type:
+                backend_shares.setdefault(wait_event_type, []).append(
+                    backend_by_type[wait_event_type] / backend_total * 100
+                )
+        for wait_event_type, shares in sorted(backend_shares.items()):
+            zenbenchmark.record(
+                f"{prefix}.{wait_event_type}.backend_max",
+                max(shares),
+                "%",
+                MetricReport.TEST_PARAM
+                if wait_event_type == NO_WAIT_EVENT[0]
+                else MetricReport.LOWER_IS_BETTER,
+            )
 
 
 @pytest.fixture(scope="function")
@@ -58,3 +217,79 @@ def pg_stats_wal() -> List[PgStatTable]:
             ["wal_records", "wal_fpi", "wal_bytes", "wal_buffers_full", "wal_write"],
         )
     ]
+
+
+@pytest.fixture(scope="function")
+def pg_stats_io() -> List[PgStatTable]:
+    """Buffer hits and reads, in total and per table. See PgCompare.record_pg_stats for hit ratios"""
+    return [
+        PgStatTable(
+            "pg_stat_database",
+            ["blks_hit", "blks_read"],
+            "WHERE datname='postgres'",
+            reports={"blks_read": MetricReport.LOWER_IS_BETTER},
+            default_report=MetricReport.TEST_PARAM,
+        ),
+        PgStatTable(
+            "pg_statio_user_tables",
+            ["heap_blks_hit", "heap_blks_read", "idx_blks_hit", "idx_blks_read"],
+            key_column="relname",
+            reports={
+                "heap_blks_read": MetricReport.LOWER_IS_BETTER,
+                "idx_blks_read": MetricReport.LOWER_IS_BETTER,
+            },
+            default_report=MetricReport.TEST_PARAM,
+        ),
+    ]
+
+
+@pytest.fixture(scope="function")
+def pg_stats_tables() -> List[PgStatTable]:
+    """Updates, HOT updates and dead tuples per table, and how much each table grew"""
+    return [
+        PgStatTable(
+            "pg_stat_user_tables",
+            [
+                "n_tup_upd",
+                "n_tup_hot_upd",
+                "n_dead_tup",
+                "pg_relation_size(relid) AS relation_size",
+                "pg_total_relation_size(relid) AS total_relation_size",
+            ],
+            key_column="relname",
+            reports={
+                "n_tup_hot_upd": MetricReport.HIGHER_IS_BETTER,
+                "n_dead_tup": MetricReport.LOWER_IS_BETTER,
+                "relation_size": MetricReport.LOWER_IS_BETTER,
+                "total_relation_size": MetricReport.LOWER_IS_BETTER,
+            },
+            default_report=MetricReport.TEST_PARAM,
+        ),
+    ]
+
+
+@pytest.fixture(scope="function")
+def pg_stats_checkpointer() -> List[PgStatTable]:
+    return [
+        PgStatTable(
+            "pg_stat_bgwriter",
+            [
+                "checkpoints_timed",
+                "checkpoints_req",
+                "buffers_checkpoint",
+                "buffers_clean",
+                "maxwritten_clean",
+                "buffers_backend",
+                "buffers_backend_fsync",
+                "buffers_alloc",
+            ],
+            # the backends having to write and fsync buffers themselves is bad
+            reports={
+                "checkpoints_req": MetricReport.LOWER_IS_BETTER,
+                "maxwritten_clean": MetricReport.LOWER_IS_BETTER,
+                "buffers_backend": MetricReport.LOWER_IS_BETTER,
+                "buffers_backend_fsync": MetricReport.LOWER_IS_BETTER,
+            },
+            default_report=MetricReport.TEST_PARAM,
+        )
+    ]
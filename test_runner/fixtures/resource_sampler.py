@@ -0,0 +1,323 @@
+import csv
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import psutil
+import pytest
+from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker
+from fixtures.log_helper import log
+from fixtures.neon_fixtures import NeonEnv, VanillaPostgres
+
+"""
+This file contains a fixture that samples CPU, memory, I/O and context switches
+of Neon processes in a background thread, e.g.:
+
+>>> def test_mybench(neon_simple_env: NeonEnv, zenbenchmark, resource_sampler):
+...     env = neon_simple_env
+...     with resource_sampler.sample(neon_env_processes(env)):
+...         run_workload()
+...     resource_sampler.report(zenbenchmark)
+
+Each sampled process is accounted together with all its children, so a compute
+includes all its backends, and the pageserver includes its walredo processes.
+The raw time series is saved as `resource_usage.csv` in the test output directory,
+and attached to the Allure report.
+"""
+
+# Returns name -> pid of the processes to sample. Called on every tick, so it's
+# fine to start or stop processes while sampling.
+ProcessFinder = Callable[[], Dict[str, int]]
+
+MB = 1024 * 1024
+
+CSV_COLUMNS = (
+    "timestamp",
+    "name",
+    "cpu_time",
+    "rss",
+    "read_bytes",
+    "write_bytes",
+    "ctx_switches",
+)
+
+
+def read_pid_file(path: Path) -> Optional[int]:
+    """Return the pid from the first line of a pid file, or None if there's no such file"""
+    try:
+        return int(path.read_text().splitlines()[0])
+    except (FileNotFoundError, IndexError, ValueError):
+        return None
+
+
+def neon_env_processes(env: NeonEnv) -> ProcessFinder:
+    """Find the pageserver, safekeepers, storage_broker and all running computes of `env`"""
+
+    def find() -> Dict[str, int]:
+        pid_files = {"pageserver": env.repo_dir / "pageserver.pid"}
+        for sk in env.safekeepers:
+            pid_files[f"safekeeper{sk.id}"] = Path(sk.data_dir()) / "safekeeper.pid"
+        for pg in env.postgres.instances:
+            if pg.running and pg.node_name is not None:
+                pid_files[f"compute_{pg.node_name}"] = (
+                    Path(pg.pg_data_dir_path()) / "postmaster.pid"
+                )
+
+        pids = {}
+        for name, pid_file in pid_files.items():
+            if (pid := read_pid_file(pid_file)) is not None:
+                pids[name] = pid
+        if env.broker.handle is not None:
+            pids["storage_broker"] = env.broker.handle.pid
+        return pids
+
+    return find
+
+
+def vanilla_processes(vanilla_pg: VanillaPostgres) -> ProcessFinder:
+    """Find the postmaster of a vanilla postgres"""
+
+    def find() -> Dict[str, int]:
+        pid = read_pid_file(vanilla_pg.pgdatadir / "postmaster.pid")
+        return {} if pid is None else {"postgres": pid}
+
+    return find
+
+
+@dataclass
+class ResourceSample:
+    timestamp: float
+    # cumulative since the start of sampling: seconds, bytes, bytes, count
+    cpu_time: float
+    read_bytes: int
+    write_bytes: int
+    ctx_switches: int
+    # current, bytes
+    rss: int
+
+
+@dataclass
+class _ProcessCounters:
+    cpu_time: float = 0.0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    ctx_switches: int = 0
+
+
+@dataclass
+class _ProcessGroup:
+    # last seen counters of each process, to sum up increments across the tree
+    last: Dict[int, _ProcessCounters] = field(default_factory=dict)
+    total: _ProcessCounters = field(default_factory=_ProcessCounters)
+    samples: List[ResourceSample] = field(default_factory=list)
+
+
+class ResourceSampler:
+    """
+    Periodically samples resource usage of a set of process trees, see the
+    module docstring for usage.
+    """
+
+    def __init__(self, output_dir: Path, interval: float = 0.2):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.groups: Dict[str, _ProcessGroup] = defaultdict(_ProcessGroup)
+        self._processes: Dict[int, psutil.Process] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_at = 0.0
+
+    def _process(self, pid: int) -> psutil.Process:
+        # Keep Process objects around: psutil uses their creation time to detect
+        # reused pids, and caches some static info.
+        proc = self._processes.get(pid)
+        if proc is None or not proc.is_running():
+            proc = self._processes[pid] = psutil.Process(pid)
+        return proc
+
+    def _sample_tree(self, group: _ProcessGroup, root_pid: int, now: float):
+        rss = 0
+        seen: Dict[int, _ProcessCounters] = {}
+        try:
+            root = self._process(root_pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return  # not running (yet, or anymore)
+
+        for proc in tree:
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_times()
+                    io = proc.io_counters()
+                    ctx = proc.num_ctx_switches()
+                    mem = proc.memory_info()
+                    created_at = proc.create_time()
+            except psutil.Error:
+                continue  # process exited in the meantime
+
+            counters = _ProcessCounters(
+                cpu_time=cpu.user + cpu.system,
+                read_bytes=io.read_bytes,
+                write_bytes=io.write_bytes,
+                ctx_switches=ctx.voluntary + ctx.involuntary,
+            )
+            # Processes that existed before the sampling started only contribute
+            # the usage since then. Processes started later contribute everything.
+            prev = group.last.get(proc.pid)
+            if prev is None and created_at < self._started_at:
+                prev = counters
+            prev = prev or _ProcessCounters()
+
+            group.total.cpu_time += counters.cpu_time - prev.cpu_time
+            group.total.read_bytes += counters.read_bytes - prev.read_bytes
+            group.total.write_bytes += counters.write_bytes - prev.write_bytes
+            group.total.ctx_switches += counters.ctx_switches - prev.ctx_switches
+            seen[proc.pid] = counters
+            rss += mem.rss
+
+        group.last = seen
+        group.samples.append(
+            ResourceSample(
+                timestamp=now,
+                cpu_time=group.total.cpu_time,
+                read_bytes=group.total.read_bytes,
+                write_bytes=group.total.write_bytes,
+                ctx_switches=group.total.ctx_switches,
+                rss=rss,
+            )
+        )
+
+    def _run(self, find_processes: ProcessFinder):
+        while not self._stop.is_set():
+            now = time.time()
+            try:
+                pids = find_processes()
+            except Exception as e:
+                log.warning(f"resource sampler failed to find processes: {e}")
+                pids = {}
+            for name, pid in pids.items():
+                self._sample_tree(self.groups[name], pid, now)
+            self._stop.wait(max(0.0, self.interval - (time.time() - now)))
+
+    def start(self, find_processes: ProcessFinder):
+        assert self._thread is None, "resource sampler is already running"
+        self._stop.clear()
+        self._started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, args=(find_processes,), name="resource-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.save()
+
+    @contextmanager
+    def sample(self, find_processes: ProcessFinder) -> Iterator[None]:
+        self.start(find_processes)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def save(self) -> Path:
+        """Write the raw time series of all process groups into a csv file"""
+        path = self.output_dir / "resource_usage.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for name, group in sorted(self.groups.items()):
+                for s in group.samples:
+                    writer.writerow(
+                        (
+                            f"{s.timestamp:.3f}",
+                            name,
+                            f"{s.cpu_time:.3f}",
+                            s.rss,
+                            s.read_bytes,
+                            s.write_bytes,
+                            s.ctx_switches,
+                        )
+                    )
+        return path
+
+    def _peak_total_rss(self) -> int:
+        # RSS of all the groups sampled at the same tick
+        by_tick: Dict[float, int] = defaultdict(int)
+        for group in self.groups.values():
+            for s in group.samples:
+                by_tick[s.timestamp] += s.rss
+        return max(by_tick.values(), default=0)
+
+    def report(self, zenbenchmark: NeonBenchmarker, prefix: str = "resources"):
+        """
+        Record peak and average RSS, and total CPU time, disk I/O and context
+        switches of each process group, plus the totals over all of them.
+        """
+        groups = {name: group for name, group in self.groups.items() if group.samples}
+        if not groups:
+            log.warning("resource sampler has no samples, nothing to record")
+            return
+
+        total = _ProcessCounters()
+        for name, group in sorted(groups.items()):
+            self._record_counters(zenbenchmark, f"{prefix}.{name}", group.total)
+            rss = [s.rss for s in group.samples]
+            zenbenchmark.record(
+                f"{prefix}.{name}.peak_rss", max(rss) / MB, "MB", MetricReport.LOWER_IS_BETTER
+            )
+            zenbenchmark.record(
+                f"{prefix}.{name}.avg_rss",
+                sum(rss) / len(rss) / MB,
+                "MB",
+                MetricReport.LOWER_IS_BETTER,
+            )
+            total.cpu_time += group.total.cpu_time
+            total.read_bytes += group.total.read_bytes
+            total.write_bytes += group.total.write_bytes
+            total.ctx_switches += group.total.ctx_switches
+
+        self._record_counters(zenbenchmark, f"{prefix}.total", total)
+        zenbenchmark.record(
+            f"{prefix}.total.peak_rss",
+            self._peak_total_rss() / MB,
+            "MB",
+            MetricReport.LOWER_IS_BETTER,
+        )
+
+    @staticmethod
+    def _record_counters(zenbenchmark: NeonBenchmarker, prefix: str, counters: _ProcessCounters):
+        zenbenchmark.record(
+            f"{prefix}.cpu_time", counters.cpu_time, "s", MetricReport.LOWER_IS_BETTER
+        )
+        zenbenchmark.record(
+            f"{prefix}.read_bytes", counters.read_bytes / MB, "MB", MetricReport.LOWER_IS_BETTER
+        )
+        zenbenchmark.record(
+            f"{prefix}.write_bytes", counters.write_bytes / MB, "MB", MetricReport.LOWER_IS_BETTER
+        )
+        zenbenchmark.record(
+            f"{prefix}.ctx_switches", counters.ctx_switches, "", MetricReport.LOWER_IS_BETTER
+        )
+
+
+@pytest.fixture(scope="function")
+def resource_sampler(test_output_dir: Path) -> Iterator[ResourceSampler]:
+    """
+    A background sampler of CPU, memory, disk I/O and context switches. The
+    interval can be set with the RESOURCE_SAMPLER_INTERVAL environment variable,
+    in seconds, 0.2 by default.
+    """
+    interval = float(os.getenv("RESOURCE_SAMPLER_INTERVAL", "0.2"))
+    sampler = ResourceSampler(test_output_dir, interval=interval)
+    yield sampler
+    sampler.stop()
@@ -1,29 +1,68 @@
+import functools
+import operator
 import random
+from array import array
 from functools import total_ordering
-from typing import Any, Type, TypeVar, Union
+from typing import (
+    Any,
+    Hashable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+    overload,
+)
 
 T = TypeVar("T", bound="Id")
 
+# How many distinct strings to keep parsed Lsns and Ids for
+INTERN_CACHE_SIZE = 65536
+
 
 @total_ordering
 class Lsn:
     """
     Datatype for an LSN. Internally it is a 64-bit integer, but the string
     representation is like "1/123abcd". See also pg_lsn datatype in Postgres
+
+    Lsns are immutable, and parsing the same string again returns the same object.
     """
 
-    def __init__(self, x: Union[int, str]):
+    __slots__ = ("lsn_int", "_str")
+
+    lsn_int: int
+    _str: Optional[str]
+
+    def __new__(cls, x: Union[int, str]) -> "Lsn":
         if isinstance(x, int):
-            self.lsn_int = x
-        else:
-            """Convert lsn from hex notation to int."""
-            l, r = x.split("/")
-            self.lsn_int = (int(l, 16) << 32) + int(r, 16)
-        assert 0 <= self.lsn_int <= 0xFFFFFFFF_FFFFFFFF
+            return cls._from_int(x)
+        return _parse_lsn(x)
+
+    @classmethod
+    def _from_int(cls, x: int) -> "Lsn":
+        assert 0 <= x <= 0xFFFFFFFF_FFFFFFFF
+        self = object.__new__(cls)
+        object.__setattr__(self, "lsn_int", x)
+        object.__setattr__(self, "_str", None)
+        return self
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return (type(self), (self.lsn_int,))
 
     def __str__(self) -> str:
         """Convert lsn from int to standard hex notation."""
-        return f"{(self.lsn_int >> 32):X}/{(self.lsn_int & 0xFFFFFFFF):X}"
+        if self._str is None:
+            s = f"{(self.lsn_int >> 32):X}/{(self.lsn_int & 0xFFFFFFFF):X}"
+            object.__setattr__(self, "_str", s)
+            return s
+        return self._str
 
     def __repr__(self) -> str:
         return f'Lsn("{str(self)}")'
@@ -48,23 +87,139 @@ class Lsn:
         return self.lsn_int - other.lsn_int
 
     def __hash__(self) -> int:
+        # the hash of an int is the int itself, nothing to cache
         return hash(self.lsn_int)
 
 
+@functools.lru_cache(maxsize=INTERN_CACHE_SIZE)
+def _parse_lsn(x: str) -> Lsn:
+    """Convert lsn from hex notation to int."""
+    return Lsn._from_int(_lsn_str_to_int(x))
+
+
+def _lsn_str_to_int(x: str) -> int:
+    l, r = x.split("/")
+    return (int(l, 16) << 32) + int(r, 16)
+
+
+class LsnArray:
+    """
+    A sequence of LSNs, e.g. a lag time series, stored as an array of unsigned
+    64-bit integers rather than as Lsn objects. Differences and rates are
+    computed over the whole arrays at once:
+
+    >>> flush = LsnArray.parse(["0/16B5A50", "0/16B9188"])
+    >>> received = LsnArray.parse(["0/16B5A50", "0/16B5A50"])
+    >>> list(flush - received)
+    [0, 14136]
+    >>> list(flush.rate([0.0, 0.5]))
+    [28272.0]
+    """
+
+    __slots__ = ("values",)
+
+    values: "array[int]"
+
+    def __init__(self, lsns: Iterable[Union[int, Lsn]] = ()):
+        self.values = array("Q", map(int, lsns))
+
+    @classmethod
+    def parse(cls, lsns: Iterable[str]) -> "LsnArray":
+        """Parse LSNs in the "1/123abcd" notation"""
+        result = cls()
+        result.values = array("Q", map(_lsn_str_to_int, lsns))
+        return result
+
+    def append(self, lsn: Union[int, str, Lsn]):
+        self.values.append(_lsn_str_to_int(lsn) if isinstance(lsn, str) else int(lsn))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, i: int) -> Lsn:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> "LsnArray":
+        ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Lsn, "LsnArray"]:
+        if isinstance(i, slice):
+            result = LsnArray()
+            result.values = self.values[i]
+            return result
+        return Lsn(self.values[i])
+
+    def __iter__(self) -> Iterator[Lsn]:
+        return map(Lsn, self.values)
+
+    def __repr__(self) -> str:
+        return f"LsnArray([{', '.join(str(lsn) for lsn in self)}])"
+
+    # Returns the elementwise differences, in bytes
+    def __sub__(self, other: Any) -> "array[int]":
+        if isinstance(other, Lsn):
+            other_int = other.lsn_int
+            return array("q", (x - other_int for x in self.values))
+        if not isinstance(other, LsnArray):
+            return NotImplemented
+        assert len(self) == len(other), f"length mismatch: {len(self)} != {len(other)}"
+        return array("q", map(operator.sub, self.values, other.values))
+
+    def deltas(self) -> "array[int]":
+        """Differences between consecutive LSNs, in bytes"""
+        return array("q", map(operator.sub, self.values[1:], self.values[:-1]))
+
+    def rate(self, timestamps: Sequence[float]) -> "array[float]":
+        """
+        Bytes per second between consecutive LSNs, taken at `timestamps` (in seconds),
+        e.g. how fast a safekeeper receives WAL. Intervals without elapsed time, e.g.
+        between samples taken at the same clock tick, are skipped.
+        """
+        assert len(timestamps) == len(self), f"{len(timestamps)} timestamps for {len(self)} LSNs"
+        elapsed = map(operator.sub, timestamps[1:], timestamps[:-1])
+        return array("d", (delta / dt for delta, dt in zip(self.deltas(), elapsed) if dt > 0))
+
+
 @total_ordering
 class Id:
     """
-    Datatype for a Neon tenant and timeline IDs. Internally it's a 16-byte array, and
+    Datatype for a Neon tenant and timeline IDs. Internally it's 16 bytes, and
     the string representation is in hex. This corresponds to the Id / TenantId /
     TimelineIds in the Rust code.
+
+    Ids are immutable, and parsing the same string again returns the same object.
     """
 
-    def __init__(self, x: str):
-        self.id = bytearray.fromhex(x)
-        assert len(self.id) == 16
+    __slots__ = ("id", "_str", "_hash")
+
+    id: bytes
+    _str: str
+    _hash: int
+
+    def __new__(cls: Type[T], x: str) -> T:
+        id: T = _parse_id(cast(Hashable, cls), x)
+        return id
+
+    @classmethod
+    def _from_bytes(cls: Type[T], id: bytes) -> T:
+        assert len(id) == 16
+        self = object.__new__(cls)
+        s = id.hex()
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "_str", s)
+        object.__setattr__(self, "_hash", hash(s))
+        return self
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return (type(self), (self._str,))
 
     def __str__(self) -> str:
-        return self.id.hex()
+        return self._str
 
     def __lt__(self, other) -> bool:
         if not isinstance(other, type(self)):
@@ -72,24 +227,35 @@ class Id:
         return self.id < other.id
 
     def __eq__(self, other) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, type(self)):
             return NotImplemented
         return self.id == other.id
 
     def __hash__(self) -> int:
-        return hash(str(self.id))
+        return self._hash
 
     @classmethod
     def generate(cls: Type[T]) -> T:
         """Generate a random ID"""
-        return cls(random.randbytes(16).hex())
+        return cls._from_bytes(random.randbytes(16))
+
+
+@functools.lru_cache(maxsize=INTERN_CACHE_SIZE)
+def _parse_id(cls: Any, x: str) -> Any:
+    return cls._from_bytes(bytes.fromhex(x))
 
 
 class TenantId(Id):
+    __slots__ = ()
+
     def __repr__(self) -> str:
-        return f'`TenantId("{self.id.hex()}")'
+        return f'`TenantId("{self._str}")'
 
 
 class TimelineId(Id):
+    __slots__ = ()
+
     def __repr__(self) -> str:
-        return f'TimelineId("{self.id.hex()}")'
+        return f'TimelineId("{self._str}")'
@@ -1,11 +1,27 @@
+import bisect
 import contextlib
 import os
 import re
 import subprocess
 import tarfile
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Tuple, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import allure  # type: ignore
 from fixtures.log_helper import log
@@ -50,6 +66,7 @@ def subprocess_capture(capture_dir: Path, cmd: List[str], **kwargs: Any) -> str:
 
 
 _global_counter = 0
+_global_counter_lock = threading.Lock()
 
 
 def global_counter() -> int:
@@ -57,10 +74,13 @@ def global_counter() -> int:
 
     This is useful for giving output files a unique number, so if we run the
     same command multiple times we can keep their output separate.
+    It's safe to call from several threads, e.g. when running pgbench
+    against several computes at once.
     """
     global _global_counter
-    _global_counter += 1
-    return _global_counter
+    with _global_counter_lock:
+        _global_counter += 1
+        return _global_counter
 
 
 def print_gc_result(row: Dict[str, Any]):
@@ -87,35 +107,341 @@ def query_scalar(cur: cursor, query: str) -> Any:
     return var[0]
 
 
-# Traverse directory to get total size.
-def get_dir_size(path: str) -> int:
+# How many subdirectories to scan in parallel when sizing a directory
+DIR_SIZE_WORKERS = 8
+
+
+def _get_file_sizes(path: str) -> Dict[str, int]:
+    """Return the size in bytes of every file under `path`, by its path."""
+    sizes = {}
+    dirs = [path]
+    while dirs:
+        try:
+            entries = os.scandir(dirs.pop())
+        except OSError:
+            # like os.walk: the directory could be concurrently removed, or not be one
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    # like os.walk, don't descend into symlinked directories
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            dirs.append(entry.path)
+                    else:
+                        sizes[entry.path] = entry.stat().st_size
+                except FileNotFoundError:
+                    pass  # file could be concurrently removed
+    return sizes
+
+
+def get_file_sizes_by_subdir(
+    path: Union[str, Path], max_workers: int = DIR_SIZE_WORKERS
+) -> Dict[str, Dict[str, int]]:
+    """
+    Return the size in bytes of every file under `path`, grouped by the top-level
+    subdirectory they are in, and under "" for the files directly in `path`.
+    The subdirectories are scanned in parallel.
+    """
+    result: Dict[str, Dict[str, int]] = {"": {}}
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry)
+                    else:
+                        result[""][entry.path] = entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+    except OSError:
+        # like os.walk, e.g. if `path` doesn't exist or is a file
+        return result
+
+    paths = [subdir.path for subdir in subdirs]
+    if len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+            sizes = list(executor.map(_get_file_sizes, paths))
+    else:
+        sizes = [_get_file_sizes(path) for path in paths]
+    result.update(zip((subdir.name for subdir in subdirs), sizes))
+    return result
+
+
+def get_subdir_sizes(path: Union[str, Path], max_workers: int = DIR_SIZE_WORKERS) -> Dict[str, int]:
+    """
+    Return the size in bytes of every top-level subdirectory of `path`, by name,
+    and under "" the size of the files directly in `path`.
+    """
+    return {
+        name: sum(sizes.values())
+        for name, sizes in get_file_sizes_by_subdir(path, max_workers).items()
+    }
+
+
+def get_dir_size(path: Union[str, Path]) -> int:
     """Return size in bytes."""
-    totalbytes = 0
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            try:
-                totalbytes += os.path.getsize(os.path.join(root, name))
-            except FileNotFoundError:
-                pass  # file could be concurrently removed
+    return sum(get_subdir_sizes(path).values())
+
+
+@dataclass
+class DirSizeDiff:
+    """How the files in a directory tree changed between two snapshots, in bytes"""
+
+    # new files, and the growth of the existing ones
+    added_bytes: int = 0
+    # removed files, and the shrinking of the existing ones
+    removed_bytes: int = 0
+    # the total size, as of the newer snapshot
+    total_bytes: int = 0
 
-    return totalbytes
+    @property
+    def net_bytes(self) -> int:
+        return self.added_bytes - self.removed_bytes
+
+
+class DirSizeTracker:
+    """
+    Keeps a snapshot of the file sizes in a directory tree, to tell how many bytes
+    were added and removed since the last call, e.g. while compaction replaces
+    layer files:
+
+    tracker = DirSizeTracker(env.timeline_dir(tenant_id, timeline_id))
+    run_workload()
+    diff = tracker.update()
+    log.info(f"{diff.added_bytes} bytes written, {diff.removed_bytes} bytes removed")
+    """
+
+    def __init__(self, path: Union[str, Path], max_workers: int = DIR_SIZE_WORKERS):
+        self.path = path
+        self.max_workers = max_workers
+        self.sizes = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, int]:
+        sizes: Dict[str, int] = {}
+        for subdir_sizes in get_file_sizes_by_subdir(self.path, self.max_workers).values():
+            sizes.update(subdir_sizes)
+        return sizes
+
+    def update(self) -> DirSizeDiff:
+        """Take a new snapshot, and return the changes since the previous one"""
+        old_sizes, self.sizes = self.sizes, self._snapshot()
+        diff = DirSizeDiff(total_bytes=sum(self.sizes.values()))
+        for path, size in self.sizes.items():
+            change = size - old_sizes.pop(path, 0)
+            if change > 0:
+                diff.added_bytes += change
+            else:
+                diff.removed_bytes -= change
+        # the files that are gone
+        diff.removed_bytes += sum(old_sizes.values())
+        return diff
 
 
 def get_timeline_dir_size(path: Path) -> int:
     """Get the timeline directory's total size, which only counts the layer files' size."""
-    sz = 0
-    for dir_entry in path.iterdir():
-        with contextlib.suppress(Exception):
-            # file is an image layer
-            _ = parse_image_layer(dir_entry.name)
-            sz += dir_entry.stat().st_size
-            continue
+    return TimelineLayers.from_dir(path).layer_bytes
+
+
+# Key::MAX, the end of the key range of L0 delta layers
+MAX_KEY = (1 << 144) - 1
+
+
+@dataclass
+class LayerFile:
+    name: str
+    size: int
+    key_start: int
+    key_end: int
+    # for image layers, both are the lsn of the snapshot
+    lsn_start: int
+    lsn_end: int
+    is_delta: bool
+
+    @property
+    def is_l0(self) -> bool:
+        """L0 delta layers cover the whole key space"""
+        return self.is_delta and self.key_start == 0 and self.key_end == MAX_KEY
+
+    @classmethod
+    def parse(cls, path: Path) -> "LayerFile":
+        """Parse a layer file name, raise ValueError if it's not a layer file"""
+        try:
+            key_start, key_end, lsn = parse_image_layer(path.name)
+            return cls(path.name, path.stat().st_size, key_start, key_end, lsn, lsn, False)
+        except (IndexError, ValueError):
+            pass
+        try:
+            key_start, key_end, lsn_start, lsn_end = parse_delta_layer(path.name)
+        except (IndexError, ValueError):
+            raise ValueError(f"{path.name} is not a layer file") from None
+        return cls(path.name, path.stat().st_size, key_start, key_end, lsn_start, lsn_end, True)
+
+
+@dataclass
+class TimelineLayers:
+    """The layer files of a timeline directory, and the size of all its other files"""
+
+    layers: List[LayerFile] = field(default_factory=list)
+    other_files: int = 0
+    other_bytes: int = 0
 
-        with contextlib.suppress(Exception):
-            # file is a delta layer
-            _ = parse_delta_layer(dir_entry.name)
-            sz += dir_entry.stat().st_size
-    return sz
+    @classmethod
+    def from_dir(cls, path: Path) -> "TimelineLayers":
+        result = cls()
+        for dir_entry in path.iterdir():
+            try:
+                result.layers.append(LayerFile.parse(dir_entry))
+            except ValueError:
+                # metadata, temporary files of an ongoing flush or compaction, etc.
+                with contextlib.suppress(FileNotFoundError):
+                    result.other_bytes += dir_entry.stat().st_size
+                    result.other_files += 1
+            except FileNotFoundError:
+                pass  # layer could be concurrently removed by compaction or gc
+        return result
+
+    @property
+    def image_layers(self) -> List[LayerFile]:
+        return [layer for layer in self.layers if not layer.is_delta]
+
+    @property
+    def delta_layers(self) -> List[LayerFile]:
+        return [layer for layer in self.layers if layer.is_delta]
+
+    @property
+    def layer_bytes(self) -> int:
+        return sum(layer.size for layer in self.layers)
+
+
+class LayerMapModel:
+    """
+    A model of the pageserver's layer map, built from the layer file names of a
+    timeline: which layers a GetPage request visits to reconstruct a page, and
+    how many of them there are over the whole key space.
+
+    The key space is split into the ranges between all the layer boundaries, so
+    that every key in a range visits the same layers, and the layers covering each
+    range are kept in a list. The in-memory layer and the ancestor timeline are
+    not modeled.
+    """
+
+    def __init__(self, layers: Iterable[LayerFile]):
+        self.layers = list(layers)
+        self.boundaries = sorted(
+            {layer.key_start for layer in self.layers} | {layer.key_end for layer in self.layers}
+        )
+        # the layers covering [boundaries[i], boundaries[i + 1])
+        self.ranges: List[List[LayerFile]] = [[] for _ in self.boundaries[:-1]]
+        for layer in self.layers:
+            first = bisect.bisect_left(self.boundaries, layer.key_start)
+            last = bisect.bisect_left(self.boundaries, layer.key_end)
+            for i in range(first, last):
+                self.ranges[i].append(layer)
+
+    @classmethod
+    def from_dir(cls, path: Path) -> "LayerMapModel":
+        return cls(TimelineLayers.from_dir(path).layers)
+
+    @property
+    def max_lsn(self) -> int:
+        """The newest lsn the layers have data for"""
+        return max((self._last_lsn(layer) for layer in self.layers), default=0)
+
+    @staticmethod
+    def _last_lsn(layer: LayerFile) -> int:
+        return layer.lsn_end - 1 if layer.is_delta else layer.lsn_end
+
+    def _search_range(self, range_layers: List[LayerFile], lsn: int) -> List[LayerFile]:
+        # Follows LayerMap::search in the pageserver: an image layer at exactly the
+        # lsn the page is needed as of ends the search, otherwise the newest delta
+        # layer above the newest image is visited, and the search continues below
+        # its start.
+        visited = []
+        cont_lsn = lsn
+        while True:
+            image = max(
+                (
+                    layer
+                    for layer in range_layers
+                    if not layer.is_delta and layer.lsn_start <= cont_lsn
+                ),
+                key=lambda layer: layer.lsn_start,
+                default=None,
+            )
+            image_lsn = -1 if image is None else image.lsn_start
+            delta = None
+            if image_lsn < cont_lsn:
+                delta = max(
+                    (
+                        layer
+                        for layer in range_layers
+                        if layer.is_delta
+                        and layer.lsn_start <= cont_lsn
+                        and layer.lsn_end > image_lsn
+                    ),
+                    key=lambda layer: min(layer.lsn_end, cont_lsn + 1),
+                    default=None,
+                )
+            if delta is None:
+                if image is not None:
+                    visited.append(image)
+                return visited
+            visited.append(delta)
+            cont_lsn = max(image_lsn, delta.lsn_start - 1)
+
+    def search(self, key: int, lsn: int) -> List[LayerFile]:
+        """
+        The layers a GetPage of `key` at `lsn` visits, newest first: the delta layers
+        until the first image layer, or all of them if there's no image of the key.
+        """
+        i = bisect.bisect_right(self.boundaries, key) - 1
+        if i < 0 or i >= len(self.ranges):
+            return []
+        return self._search_range(self.ranges[i], lsn)
+
+    def key_ranges(self, lsn: Optional[int] = None) -> Iterator[Tuple[int, int, List[LayerFile]]]:
+        """Yield key start, key end and the layers a GetPage at `lsn` visits, for every key range"""
+        if lsn is None:
+            lsn = self.max_lsn
+        for i, range_layers in enumerate(self.ranges):
+            yield self.boundaries[i], self.boundaries[i + 1], self._search_range(range_layers, lsn)
+
+    def read_amplification(self, lsn: Optional[int] = None) -> List[int]:
+        """
+        The number of layers a GetPage at `lsn` (the newest one by default) visits,
+        for every key range. Key ranges that no layer covers are left out.
+        """
+        return [len(visited) for _, _, visited in self.key_ranges(lsn) if visited]
+
+    def delta_chain_depths(self, lsn: Optional[int] = None) -> Dict[int, int]:
+        """
+        How many key ranges have to apply the records of 0, 1, 2, ... delta layers on
+        top of an image to reconstruct a page at `lsn`, by the number of delta layers.
+        """
+        depths: Dict[int, int] = defaultdict(int)
+        for _, _, visited in self.key_ranges(lsn):
+            if visited:
+                depths[sum(1 for layer in visited if layer.is_delta)] += 1
+        return dict(sorted(depths.items()))
+
+    def coverage_holes(self, lsn: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        The key ranges without an image layer at or below `lsn`, merged where they
+        are adjacent. A GetPage of a key in such a range has to find a record that
+        initializes the page in the delta layers, or go to the ancestor timeline.
+        """
+        holes: List[Tuple[int, int]] = []
+        for key_start, key_end, visited in self.key_ranges(lsn):
+            if visited and not visited[-1].is_delta:
+                continue
+            if holes and holes[-1][1] == key_start:
+                holes[-1] = (holes[-1][0], key_end)
+            else:
+                holes.append((key_start, key_end))
+        return holes
 
 
 def parse_image_layer(f_name: str) -> Tuple[int, int, int]:
@@ -148,7 +474,7 @@ def get_scale_for_db(size_mb: int) -> int:
 
 
 ATTACHMENT_NAME_REGEX: re.Pattern = re.compile(  # type: ignore[type-arg]
-    r"flamegraph\.svg|regression\.diffs|.+\.(?:log|stderr|stdout|filediff|metrics|html)"
+    r"flamegraph\.svg|regression\.diffs|.+\.(?:log|stderr|stdout|filediff|metrics|html|csv)"
 )
 
 
@@ -176,6 +502,9 @@ def allure_attach_from_dir(dir: Path):
             elif source.endswith(".html"):
                 attachment_type = "text/html"
                 extension = "html"
+            elif source.endswith(".csv"):
+                attachment_type = "text/csv"
+                extension = "csv"
             else:
                 attachment_type = "text/plain"
                 extension = attachment.suffix.removeprefix(".")
@@ -7,7 +7,7 @@ from contextlib import closing
 from typing import List
 
 import pytest
-from fixtures.benchmark_fixture import MetricReport
+from fixtures.benchmark_fixture import LatencyHistogram, MetricReport
 from fixtures.compare_fixtures import NeonCompare
 from fixtures.log_helper import log
 from fixtures.neon_fixtures import wait_for_last_record_lsn
@@ -15,9 +15,11 @@ from fixtures.types import Lsn
 
 
 def _record_branch_creation_durations(neon_compare: NeonCompare, durs: List[float]):
-    neon_compare.zenbenchmark.record(
-        "branch_creation_duration_max", max(durs), "s", MetricReport.LOWER_IS_BETTER
-    )
+    histogram = LatencyHistogram()
+    for dur in durs:
+        histogram.record(dur)
+    # records branch_creation_duration_max along with the p50/p90/p99/p99.9 percentiles
+    neon_compare.zenbenchmark.record_histogram("branch_creation_duration", histogram, "s")
     neon_compare.zenbenchmark.record(
         "branch_creation_duration_avg", statistics.mean(durs), "s", MetricReport.LOWER_IS_BETTER
     )
@@ -1,6 +1,7 @@
 from contextlib import closing
 
-from fixtures.compare_fixtures import PgCompare
+import pytest
+from fixtures.compare_fixtures import NeonCompare, PgCompare
 
 
 #
@@ -12,19 +13,32 @@ from fixtures.compare_fixtures import PgCompare
 # 2. Disk writes
 # 3. Disk space used
 # 4. Peak memory usage
+# 5. Pageserver metrics deltas (I/O, GetPage latency, ...)
 #
 def test_bulk_insert(neon_with_baseline: PgCompare):
-    env = neon_with_baseline
+    run_bulk_insert(neon_with_baseline)
 
+
+# The same, with different checkpointing and compaction settings
+@pytest.mark.neon_config_matrix(
+    checkpoint_distance=[8 * 1024**2, 256 * 1024**2],
+    compaction_threshold=[3, 10],
+)
+def test_bulk_insert_tenant_conf(neon_config_matrix: NeonCompare):
+    run_bulk_insert(neon_config_matrix)
+
+
+def run_bulk_insert(env: PgCompare):
     with closing(env.pg.connect()) as conn:
         with conn.cursor() as cur:
             cur.execute("create table huge (i int, j int);")
 
             # Run INSERT, recording the time and I/O it takes
             with env.record_pageserver_writes("pageserver_writes"):
-                with env.record_duration("insert"):
-                    cur.execute("insert into huge values (generate_series(1, 5000000), 0);")
-                    env.flush()
+                with env.record_metrics_delta("insert"):
+                    with env.record_duration("insert"):
+                        cur.execute("insert into huge values (generate_series(1, 5000000), 0);")
+                        env.flush()
 
             env.report_peak_memory_use()
             env.report_size()
@@ -102,6 +102,30 @@ def test_compare_pg_stats_wal_with_pgbench_default(
         env.flush()
 
 
+@pytest.mark.parametrize("seed", get_seeds_matrix())
+@pytest.mark.parametrize("scale", get_scales_matrix())
+@pytest.mark.parametrize("duration", get_durations_matrix(5))
+def test_compare_pg_stats_io_with_pgbench_default(
+    neon_with_baseline: PgCompare,
+    seed: int,
+    scale: int,
+    duration: int,
+    pg_stats_io: List[PgStatTable],
+    pg_stats_tables: List[PgStatTable],
+    pg_stats_checkpointer: List[PgStatTable],
+):
+    env = neon_with_baseline
+    # initialize pgbench
+    env.pg_bin.run_capture(["pgbench", f"-s{scale}", "-i", env.pg.connstr()])
+    env.flush()
+
+    with env.record_pg_stats(pg_stats_io + pg_stats_tables + pg_stats_checkpointer):
+        env.pg_bin.run_capture(
+            ["pgbench", f"-T{duration}", f"--random-seed={seed}", env.pg.connstr()]
+        )
+        env.flush()
+
+
 @pytest.mark.parametrize("n_tables", [1, 10])
 @pytest.mark.parametrize("duration", get_durations_matrix(10))
 def test_compare_pg_stats_wo_with_heavy_write(
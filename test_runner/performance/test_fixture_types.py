@@ -0,0 +1,41 @@
+import random
+
+from fixtures.benchmark_fixture import NeonBenchmarker
+from fixtures.types import Lsn, TenantId, TimelineId
+
+# Microbenchmark of the Lsn and Id types of the test fixtures, which are created
+# in bulk when parsing the metrics or polling the LSNs of many timelines.
+#
+# Collects metrics:
+#
+# 1. Time to parse the Lsns and Ids of a safekeeper metrics scrape, keyed by timeline
+# 2. Time to look up the timelines by their ids, and to compare their Lsns
+
+N_TIMELINES = 1000
+N_SCRAPES = 20
+
+
+def test_fixture_types(zenbenchmark: NeonBenchmarker):
+    rng = random.Random(42)
+    # as in the safekeeper_flush_lsn metric: the same timelines in every scrape
+    rows = [
+        (
+            TenantId.generate().id.hex(),
+            TimelineId.generate().id.hex(),
+            str(Lsn(rng.randrange(1 << 40))),
+        )
+        for _ in range(N_TIMELINES)
+    ]
+
+    for _ in zenbenchmark.repeat("parse", 10, warmup=1):
+        for _ in range(N_SCRAPES):
+            scrape = {
+                (TenantId(tenant_id), TimelineId(timeline_id)): Lsn(lsn)
+                for tenant_id, timeline_id, lsn in rows
+            }
+
+    keys = [(TenantId(tenant_id), TimelineId(timeline_id)) for tenant_id, timeline_id, _ in rows]
+    for _ in zenbenchmark.repeat("lookup", 10, warmup=1):
+        for _ in range(N_SCRAPES):
+            lagging = sum(1 for key in keys if scrape[key] < Lsn(1 << 39))
+    assert lagging <= N_TIMELINES
@@ -1,4 +1,5 @@
 from contextlib import closing
+from typing import Dict
 
 import pytest
 from fixtures.compare_fixtures import PgCompare
@@ -15,6 +16,17 @@ from pytest_lazyfixture import lazy_fixture  # type: ignore
     ],
 )
 def test_hot_page(env: PgCompare):
+    run_hot_page(env)
+
+
+# The same, with the evicting table fitting into the compute cache or not
+@pytest.mark.slow
+@pytest.mark.compute_config(shared_buffers=["1MB", "8MB", "128MB"])
+def test_hot_page_compute_config(neon_with_baseline: PgCompare, compute_config: Dict[str, str]):
+    run_hot_page(neon_with_baseline)
+
+
+def run_hot_page(env: PgCompare):
     # Update the same page many times, then measure read performance
     num_writes = 1000000
 
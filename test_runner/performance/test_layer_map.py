@@ -1,6 +1,8 @@
 import time
 
+from fixtures.benchmark_fixture import MetricReport
 from fixtures.neon_fixtures import NeonEnvBuilder
+from fixtures.utils import DirSizeTracker, LayerMapModel
 
 
 #
@@ -25,15 +27,31 @@ def test_layer_map(neon_env_builder: NeonEnvBuilder, zenbenchmark):
         }
     )
 
-    env.neon_cli.create_timeline("test_layer_map", tenant_id=tenant)
+    timeline = env.neon_cli.create_timeline("test_layer_map", tenant_id=tenant)
     pg = env.postgres.create_start("test_layer_map", tenant_id=tenant)
     cur = pg.connect().cursor()
     cur.execute("create table t(x integer)")
+    # How many bytes of layer files the flushes and compactions write. Layers that are
+    # written and removed between two updates are missed, so this is a lower bound.
+    timeline_dir = DirSizeTracker(env.timeline_dir(tenant, timeline))
+    bytes_written = 0
     for i in range(n_iters):
         cur.execute(f"insert into t values (generate_series(1,{n_records}))")
         time.sleep(1)
+        bytes_written += timeline_dir.update().added_bytes
+    zenbenchmark.record(
+        "layer_bytes_written",
+        bytes_written / (1024 * 1024),
+        "MB",
+        MetricReport.LOWER_IS_BETTER,
+    )
 
     cur.execute("vacuum t")
     with zenbenchmark.record_duration("test_query"):
         cur.execute("SELECT count(*) from t")
         assert cur.fetchone() == (n_iters * n_records,)
+
+    # how many layers the query had to visit for each page, as of the end of the run
+    env.pageserver.http_client().timeline_checkpoint(tenant, timeline)
+    layer_map = LayerMapModel.from_dir(env.timeline_dir(tenant, timeline))
+    zenbenchmark.record_read_amplification("layer_map", layer_map)
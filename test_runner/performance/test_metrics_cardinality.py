@@ -0,0 +1,100 @@
+import os
+import statistics
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker
+from fixtures.metrics import parse_metrics
+from fixtures.neon_fixtures import NeonEnvBuilder, PageserverHttpClient
+
+# Create more and more tenants on one pageserver, and measure how expensive its
+# /metrics endpoint gets, as most of the pageserver metrics are per tenant or
+# timeline (see PAGESERVER_PER_TENANT_METRICS).
+#
+# Collects metrics, at every step of the number of tenants:
+#
+# 1. Size of the /metrics payload, and the number of series in it, in total and per tenant
+# 2. Response time of the pageserver, and the time to parse it with parse_metrics
+#
+# The steps are 10 and 100 tenants by default. Larger ones take long to create,
+# set e.g. TEST_METRICS_CARDINALITY_TENANTS=10,100,1000 to run them.
+
+
+def get_tenant_counts(default: str = "10,100") -> List[int]:
+    counts = os.getenv("TEST_METRICS_CARDINALITY_TENANTS", default=default)
+    return sorted(int(c) for c in counts.split(","))
+
+
+SCRAPES_PER_STEP = 5
+
+
+def create_tenants(client: PageserverHttpClient, n: int):
+    def create(_):
+        tenant_id = client.tenant_create()
+        client.timeline_create(tenant_id)
+
+    # the pageserver runs initdb for every timeline, do that in parallel
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(create, range(n)))
+
+
+def record_scrape_cost(
+    zenbenchmark: NeonBenchmarker, client: PageserverHttpClient, prefix: str, n_tenants: int
+):
+    response_times = []
+    parse_times = []
+    for _ in range(SCRAPES_PER_STEP):
+        t0 = timeit.default_timer()
+        text = client.get_metrics()
+        t1 = timeit.default_timer()
+        metrics = parse_metrics(text, "pageserver")
+        t2 = timeit.default_timer()
+        response_times.append(t1 - t0)
+        parse_times.append(t2 - t1)
+
+    n_series = sum(len(samples) for samples in metrics.metrics.values())
+    n_tenant_series = sum(
+        1
+        for samples in metrics.metrics.values()
+        for sample in samples
+        if "tenant_id" in sample.labels
+    )
+    zenbenchmark.record(f"{prefix}.n_tenants", n_tenants, "", MetricReport.TEST_PARAM)
+    zenbenchmark.record(
+        f"{prefix}.payload_size", len(text.encode()) / 1024, "KiB", MetricReport.LOWER_IS_BETTER
+    )
+    zenbenchmark.record(f"{prefix}.series", n_series, "", MetricReport.LOWER_IS_BETTER)
+    zenbenchmark.record(
+        f"{prefix}.series_per_tenant",
+        n_tenant_series / n_tenants,
+        "",
+        MetricReport.LOWER_IS_BETTER,
+    )
+    zenbenchmark.record(
+        f"{prefix}.response_time",
+        statistics.median(response_times) * 1000,
+        "ms",
+        MetricReport.LOWER_IS_BETTER,
+    )
+    zenbenchmark.record(
+        f"{prefix}.parse_time",
+        statistics.median(parse_times) * 1000,
+        "ms",
+        MetricReport.LOWER_IS_BETTER,
+    )
+
+
+@pytest.mark.timeout(3600)
+def test_metrics_cardinality(neon_env_builder: NeonEnvBuilder, zenbenchmark: NeonBenchmarker):
+    neon_env_builder.num_safekeepers = 0
+    env = neon_env_builder.init_start()
+    client = env.pageserver.http_client()
+
+    # the initial tenant is there already
+    n_tenants = 1
+    for step in get_tenant_counts():
+        create_tenants(client, step - n_tenants)
+        n_tenants = step
+        record_scrape_cost(zenbenchmark, client, f"{n_tenants}_tenants", n_tenants)
@@ -0,0 +1,146 @@
+import asyncio
+import statistics
+import timeit
+from contextlib import closing
+from pathlib import Path
+from typing import List
+
+import pytest
+from fixtures.benchmark_fixture import MetricReport, PgBenchRunResult, jain_fairness_index
+from fixtures.compare_fixtures import MultiTenantNeonCompare, TenantCompute
+from performance.test_copy import copy_test_data
+from performance.test_parallel_copy_to import parallel_load_different_tables
+from performance.test_perf_pgbench import utc_now_timestamp
+
+# Run the same workload against the computes of 1, 4, 16 and 64 tenants on one
+# pageserver at the same time, to see how the pageserver scales with the number
+# of tenants, and how fairly it serves them. 16 and 64 tenants are slow.
+#
+# Collects metrics:
+#
+# 1. Wall clock duration of each workload, over all tenants
+# 2. Durations of the fastest, median and slowest tenant, and the fairness between them
+# 3. Total throughput, and throughput and latency of each tenant for pgbench
+
+PGBENCH_SCALE = 5
+PGBENCH_DURATION = 30
+COPY_ROWS = 100000
+# tables loaded in parallel into each tenant, in test_multi_tenant_parallel_copy
+COPY_PARALLEL = 2
+
+
+def record_tenants_pgbench(
+    env: MultiTenantNeonCompare, prefix: str, results: List[PgBenchRunResult]
+):
+    tps = [res.tps for res in results]
+    latencies = [res.latency_average for res in results]
+    env.zenbenchmark.record(f"{prefix}.total_tps", sum(tps), "", MetricReport.HIGHER_IS_BETTER)
+    env.zenbenchmark.record(f"{prefix}.tenant_tps_min", min(tps), "", MetricReport.HIGHER_IS_BETTER)
+    env.zenbenchmark.record(
+        f"{prefix}.tenant_tps_median", statistics.median(tps), "", MetricReport.HIGHER_IS_BETTER
+    )
+    env.zenbenchmark.record(
+        f"{prefix}.tenant_tps_fairness",
+        jain_fairness_index(tps),
+        "",
+        MetricReport.HIGHER_IS_BETTER,
+    )
+    env.zenbenchmark.record(
+        f"{prefix}.tenant_latency_average_median",
+        statistics.median(latencies),
+        "ms",
+        MetricReport.LOWER_IS_BETTER,
+    )
+    env.zenbenchmark.record(
+        f"{prefix}.tenant_latency_average_max",
+        max(latencies),
+        "ms",
+        MetricReport.LOWER_IS_BETTER,
+    )
+
+
+# creating the tenants and starting their computes takes a while
+@pytest.mark.timeout(1800)
+def test_multi_tenant_pgbench(multi_tenant_neon_compare: MultiTenantNeonCompare):
+    env = multi_tenant_neon_compare
+    env.zenbenchmark.record("scale", PGBENCH_SCALE, "", MetricReport.TEST_PARAM)
+    env.zenbenchmark.record("duration", PGBENCH_DURATION, "s", MetricReport.TEST_PARAM)
+
+    def init(tenant: TenantCompute):
+        env.pg_bin.run_capture(["pgbench", f"-s{PGBENCH_SCALE}", "-i", tenant.pg.connstr()])
+
+    def simple_update(tenant: TenantCompute) -> PgBenchRunResult:
+        run_start_timestamp = utc_now_timestamp()
+        t0 = timeit.default_timer()
+        out = env.pg_bin.run_capture(
+            ["pgbench", "-N", "-c2", f"-T{PGBENCH_DURATION}", tenant.pg.connstr()]
+        )
+        run_duration = timeit.default_timer() - t0
+        res: PgBenchRunResult = PgBenchRunResult.parse_from_stdout(
+            stdout=Path(f"{out}.stdout").read_text(),
+            run_duration=run_duration,
+            run_start_timestamp=run_start_timestamp,
+            run_end_timestamp=utc_now_timestamp(),
+        )
+        return res
+
+    with env.record_pageserver_writes("init.pageserver_writes"):
+        env.run_concurrently("init", init)
+        env.flush()
+
+    with env.record_pageserver_writes("simple-update.pageserver_writes"):
+        results = env.run_concurrently("simple-update", simple_update)
+        env.flush()
+    record_tenants_pgbench(env, "simple-update", results)
+
+    env.report_peak_memory_use()
+    env.report_size()
+
+
+@pytest.mark.timeout(1800)
+def test_multi_tenant_copy(multi_tenant_neon_compare: MultiTenantNeonCompare):
+    env = multi_tenant_neon_compare
+    env.zenbenchmark.record("rows_per_tenant", COPY_ROWS, "", MetricReport.TEST_PARAM)
+
+    def copy(tenant: TenantCompute):
+        with closing(tenant.pg.connect()) as conn:
+            with conn.cursor() as cur:
+                cur.execute("create table copytest (i int, t text)")
+                cur.copy_from(copy_test_data(COPY_ROWS), "copytest")
+
+    with env.record_pageserver_writes("copy.pageserver_writes"):
+        t0 = timeit.default_timer()
+        env.run_concurrently("copy", copy)
+        duration = timeit.default_timer() - t0
+        env.flush()
+    env.zenbenchmark.record(
+        "copy.total_rows_per_second",
+        len(env.tenants) * COPY_ROWS / duration,
+        "rows/s",
+        MetricReport.HIGHER_IS_BETTER,
+    )
+
+    env.report_peak_memory_use()
+    env.report_size()
+
+
+@pytest.mark.timeout(1800)
+def test_multi_tenant_parallel_copy(multi_tenant_neon_compare: MultiTenantNeonCompare):
+    env = multi_tenant_neon_compare
+    n_parallel = COPY_PARALLEL
+    env.zenbenchmark.record("n_parallel", n_parallel, "", MetricReport.TEST_PARAM)
+
+    def parallel_copy(tenant: TenantCompute):
+        with closing(tenant.pg.connect()) as conn:
+            with conn.cursor() as cur:
+                for worker_id in range(n_parallel):
+                    cur.execute(f"CREATE TABLE copytest_{worker_id} (i int, t text)")
+        # every thread runs its own event loop
+        asyncio.run(parallel_load_different_tables(tenant.pg, n_parallel))
+
+    with env.record_pageserver_writes("load.pageserver_writes"):
+        env.run_concurrently("load", parallel_copy)
+        env.flush()
+
+    env.report_peak_memory_use()
+    env.report_size()
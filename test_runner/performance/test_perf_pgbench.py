@@ -2,13 +2,21 @@ import calendar
 import enum
 import os
 import timeit
+from contextlib import ExitStack, nullcontext
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List
 
 import pytest
-from fixtures.benchmark_fixture import MetricReport, PgBenchInitResult, PgBenchRunResult
+from fixtures.benchmark_fixture import (
+    MetricReport,
+    PgBenchInitResult,
+    PgBenchRunResult,
+    PgBenchTransactionLog,
+)
 from fixtures.compare_fixtures import NeonCompare, PgCompare
+from fixtures.metrics_scraper import MetricsScraper
+from fixtures.resource_sampler import ResourceSampler
 from fixtures.utils import get_scale_for_db
 
 
@@ -51,29 +59,61 @@ def init_pgbench(env: PgCompare, cmdline, password: None):
     env.zenbenchmark.record_pg_bench_init_result("init", res)
 
 
-def run_pgbench(env: PgCompare, prefix: str, cmdline, password: None):
+def run_pgbench(
+    env: PgCompare,
+    prefix: str,
+    cmdline,
+    password: None,
+    log_transactions: bool = False,
+    sample_wait_events: bool = False,
+):
+    """
+    Run pgbench and record its results.
+
+    With `log_transactions`, pgbench also writes a per-transaction log into the test
+    output directory, which is used to record exact latency percentiles, per-second
+    throughput and fairness between clients.
+    With `sample_wait_events`, also records what the backends were waiting for, see
+    PgCompare.record_wait_events. The sampling queries add some load of their own.
+    """
     environ: Dict[str, str] = {}
     if password is not None:
         environ["PGPASSWORD"] = password
 
+    if log_transactions:
+        log_prefix = env.pg_bin.log_dir / f"{prefix}.pgbench_log"
+        # pgbench expects the connection string to be the last argument
+        cmdline = cmdline[:-1] + ["--log", f"--log-prefix={log_prefix}"] + cmdline[-1:]
+
     with env.record_pageserver_writes(f"{prefix}.pageserver_writes"):
-        run_start_timestamp = utc_now_timestamp()
-        t0 = timeit.default_timer()
-        out = env.pg_bin.run_capture(cmdline, env=environ)
-        run_duration = timeit.default_timer() - t0
-        run_end_timestamp = utc_now_timestamp()
+        with env.record_wait_events(prefix) if sample_wait_events else nullcontext():
+            run_start_timestamp = utc_now_timestamp()
+            t0 = timeit.default_timer()
+            out = env.pg_bin.run_capture(cmdline, env=environ)
+            run_duration = timeit.default_timer() - t0
+            run_end_timestamp = utc_now_timestamp()
         env.flush()
 
     stdout = Path(f"{out}.stdout").read_text()
+    # pgbench reports -P progress to stderr. The file is removed if it's empty.
+    stderr_path = Path(f"{out}.stderr")
+    stderr = stderr_path.read_text() if stderr_path.exists() else None
 
     res = PgBenchRunResult.parse_from_stdout(
         stdout=stdout,
         run_duration=run_duration,
         run_start_timestamp=run_start_timestamp,
         run_end_timestamp=run_end_timestamp,
+        stderr=stderr,
     )
     env.zenbenchmark.record_pg_bench_result(prefix, res)
 
+    if log_transactions:
+        # one file per pgbench thread: <log_prefix>.<pid>[.<thread>]
+        log_files = sorted(env.pg_bin.log_dir.glob(f"{log_prefix.name}.*"))
+        transaction_log = PgBenchTransactionLog.parse_from_files(log_files)
+        env.zenbenchmark.record_pg_bench_transaction_log(prefix, transaction_log)
+
 
 #
 # Initialize a pgbench database, and run pgbench against it.
@@ -87,6 +127,11 @@ def run_pgbench(env: PgCompare, prefix: str, cmdline, password: None):
 def run_test_pgbench(env: PgCompare, scale: int, duration: int, workload_type: PgBenchLoadType):
     env.zenbenchmark.record("scale", scale, "", MetricReport.TEST_PARAM)
 
+    # Set TEST_PG_BENCH_LOG_TRANSACTIONS=true to also collect per-transaction logs
+    log_transactions = os.getenv("TEST_PG_BENCH_LOG_TRANSACTIONS", "false").lower() == "true"
+    # Set TEST_PG_BENCH_SAMPLE_WAIT_EVENTS=true to also record the backends' wait events
+    sample_wait_events = os.getenv("TEST_PG_BENCH_SAMPLE_WAIT_EVENTS", "false").lower() == "true"
+
     password = env.pg.default_options.get("password", None)
     options = "-cstatement_timeout=0 " + env.pg.default_options.get("options", "")
     # drop password from the connection string by passing password=None and set password separately
@@ -111,6 +156,8 @@ def run_test_pgbench(env: PgCompare, scale: int, duration: int, workload_type: P
                 connstr,
             ],
             password=password,
+            log_transactions=log_transactions,
+            sample_wait_events=sample_wait_events,
         )
 
     if workload_type == PgBenchLoadType.SELECT_ONLY:
@@ -128,6 +175,8 @@ def run_test_pgbench(env: PgCompare, scale: int, duration: int, workload_type: P
                 connstr,
             ],
             password=password,
+            log_transactions=log_transactions,
+            sample_wait_events=sample_wait_events,
         )
 
     env.report_size()
@@ -168,13 +217,48 @@ def get_scales_matrix(default: int = 10) -> List[int]:
 # Run the pgbench tests against vanilla Postgres and neon
 @pytest.mark.parametrize("scale", get_scales_matrix())
 @pytest.mark.parametrize("duration", get_durations_matrix())
-def test_pgbench(neon_with_baseline: PgCompare, scale: int, duration: int):
+def test_pgbench(
+    neon_with_baseline: PgCompare,
+    resource_sampler: ResourceSampler,
+    metrics_scraper: MetricsScraper,
+    scale: int,
+    duration: int,
+):
+    # Set TEST_PG_BENCH_SAMPLE_RESOURCES=true to also record the CPU, memory and disk
+    # use of the processes, and TEST_PG_BENCH_SCRAPE_METRICS=true to save the time
+    # series of the /metrics endpoints. The sampling adds some load of its own.
+    sample_resources = os.getenv("TEST_PG_BENCH_SAMPLE_RESOURCES", "false").lower() == "true"
+    scrape_metrics = os.getenv("TEST_PG_BENCH_SCRAPE_METRICS", "false").lower() == "true"
+
+    with ExitStack() as stack:
+        if sample_resources:
+            stack.enter_context(resource_sampler.sample(neon_with_baseline.processes()))
+        if scrape_metrics:
+            stack.enter_context(metrics_scraper.scrape(neon_with_baseline.metrics_endpoints()))
+        run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.INIT)
+        run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.SIMPLE_UPDATE)
+        run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.SELECT_ONLY)
+    if sample_resources:
+        resource_sampler.report(neon_with_baseline.zenbenchmark)
+
+
+# Run the read-only workload with different compute cache sizes and prefetch
+# settings, to see how much the compute cache matters
+@pytest.mark.slow
+@pytest.mark.compute_config(
+    shared_buffers=["1MB", "128MB", "1GB"],
+    effective_io_concurrency=[1, 32],
+)
+@pytest.mark.parametrize("scale", get_scales_matrix())
+@pytest.mark.parametrize("duration", get_durations_matrix())
+def test_pgbench_compute_config(
+    neon_with_baseline: PgCompare, compute_config: Dict[str, str], scale: int, duration: int
+):
     run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.INIT)
-    run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.SIMPLE_UPDATE)
     run_test_pgbench(neon_with_baseline, scale, duration, PgBenchLoadType.SELECT_ONLY)
 
 
-# Run the pgbench tests, and generate a flamegraph from it
+# Run the pgbench tests, and generate a flamegraph for each of the workloads.
 # This requires that the pageserver was built with the 'profiling' feature.
 #
 # TODO: If the profiling is cheap enough, there's no need to run the same test
@@ -183,17 +267,14 @@ def test_pgbench(neon_with_baseline: PgCompare, scale: int, duration: int):
 @pytest.mark.parametrize("scale", get_scales_matrix())
 @pytest.mark.parametrize("duration", get_durations_matrix())
 def test_pgbench_flamegraph(zenbenchmark, pg_bin, neon_env_builder, scale: int, duration: int):
-    neon_env_builder.pageserver_config_override = """
-profiling="page_requests"
-"""
     env = neon_env_builder.init_start()
     env.pageserver.is_profiling_enabled_or_skip()
     env.neon_cli.create_branch("empty", "main")
 
     neon_compare = NeonCompare(zenbenchmark, env, pg_bin, "pgbench")
-    run_test_pgbench(neon_compare, scale, duration, PgBenchLoadType.INIT)
-    run_test_pgbench(neon_compare, scale, duration, PgBenchLoadType.SIMPLE_UPDATE)
-    run_test_pgbench(neon_compare, scale, duration, PgBenchLoadType.SELECT_ONLY)
+    for workload_type in PgBenchLoadType:
+        with neon_compare.profile_phase(workload_type.value):
+            run_test_pgbench(neon_compare, scale, duration, workload_type)
 
 
 # The following 3 tests run on an existing database as it was set up by previous tests,
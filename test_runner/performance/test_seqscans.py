@@ -1,6 +1,7 @@
 # Test sequential scan speed
 #
 from contextlib import closing
+from typing import Dict, Optional
 
 import pytest
 from fixtures.benchmark_fixture import MetricReport
@@ -34,8 +35,34 @@ from pytest_lazyfixture import lazy_fixture  # type: ignore
     ],
 )
 def test_seqscans(env: PgCompare, scale: int, rows: int, iters: int, workers: int):
-    rows = scale * rows
+    run_seqscans(env, scale * rows, iters, workers)
 
+
+# The small table with different compute settings, to see how the scans depend
+# on the cache size, prefetching and parallelism. Vanilla postgres doesn't know the
+# prefetch settings, and doesn't prefetch in sequential scans.
+@pytest.mark.slow
+@pytest.mark.compute_config(
+    shared_buffers=["1MB", "128MB"],
+    max_parallel_workers_per_gather=[0, 4],
+    enable_seqscan_prefetch=["off", "on"],
+    seqscan_prefetch_buffers=[10, 100],
+)
+def test_seqscans_compute_config(neon_with_baseline: PgCompare, compute_config: Dict[str, str]):
+    run_seqscans(neon_with_baseline, 100000, 100, workers=None, check_table_size=False)
+
+
+def run_seqscans(
+    env: PgCompare,
+    rows: int,
+    iters: int,
+    workers: Optional[int],
+    check_table_size: bool = True,
+):
+    """
+    Scan a table of `rows` rows `iters` times. With `workers=None`, the
+    max_parallel_workers_per_gather of the compute is used.
+    """
     with closing(env.pg.connect(options="-cstatement_timeout=0")) as conn:
         with conn.cursor() as cur:
             cur.execute("drop table if exists t;")
@@ -54,11 +81,17 @@ def test_seqscans(env: PgCompare, scale: int, rows: int, iters: int, workers: in
             shared_buffers = row[0]
             table_size = row[1]
             log.info(f"shared_buffers is {shared_buffers}, table size {table_size}")
-            assert int(shared_buffers) < int(table_size)
+            if check_table_size:
+                assert int(shared_buffers) < int(table_size)
             env.zenbenchmark.record("table_size", table_size, "bytes", MetricReport.TEST_PARAM)
+            env.zenbenchmark.record(
+                "shared_buffers", shared_buffers, "bytes", MetricReport.TEST_PARAM
+            )
 
-            cur.execute(f"set max_parallel_workers_per_gather = {workers}")
+            if workers is not None:
+                cur.execute(f"set max_parallel_workers_per_gather = {workers}")
 
             with env.record_duration("run"):
-                for i in range(iters):
+                # also record the median and the spread of individual scans
+                for _ in env.repeat("scan", iters):
                     cur.execute("select count(*) from t;")
@@ -40,6 +40,10 @@ def test_startup(neon_env_builder: NeonEnvBuilder, zenbenchmark: NeonBenchmarker
     with zenbenchmark.record_duration("second_read_time"):
         pg.safe_psql("select * from t_0;")
 
+    # And a few more times, as the data is cached now
+    for _ in zenbenchmark.repeat("second_read_time_median", 5):
+        pg.safe_psql("select * from t_0;")
+
     # Restart
     pg.stop_and_destroy()
     with zenbenchmark.record_duration("restart_with_data"):
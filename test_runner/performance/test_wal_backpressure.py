@@ -5,52 +5,46 @@ import timeit
 from typing import Any, Callable, List
 
 import pytest
-from fixtures.benchmark_fixture import MetricReport, NeonBenchmarker
-from fixtures.compare_fixtures import NeonCompare, PgCompare, VanillaCompare
+from fixtures.benchmark_fixture import LatencyHistogram, MetricReport
+from fixtures.compare_fixtures import (
+    SAFEKEEPER_TOPOLOGIES,
+    NeonCompare,
+    PgCompare,
+    SafekeeperNeonCompare,
+    SafekeeperTopology,
+    VanillaCompare,
+)
 from fixtures.log_helper import log
-from fixtures.neon_fixtures import DEFAULT_BRANCH_NAME, NeonEnvBuilder, PgBin
-from fixtures.types import Lsn
+from fixtures.types import LsnArray
 from performance.test_perf_pgbench import get_durations_matrix, get_scales_matrix
 
 
-@pytest.fixture(params=["vanilla", "neon_off", "neon_on"])
-# This fixture constructs multiple `PgCompare` interfaces using a builder pattern.
-# The builder parameters are encoded in the fixture's param.
-# For example, to build a `NeonCompare` interface, the corresponding fixture's param should have
-# a format of `neon_{safekeepers_enable_fsync}`.
-# Note that, here "_" is used to separate builder parameters.
-def pg_compare(request) -> PgCompare:
-    x = request.param.split("_")
+def topology_param(topology: SafekeeperTopology) -> Any:
+    # Keep the ids the single safekeeper configurations had before the other
+    # topologies were added, the history of their results is keyed by them.
+    if topology.num_safekeepers == 1 and not topology.auth:
+        return pytest.param(topology, id=f"neon_{'on' if topology.fsync else 'off'}")
+    return topology.param()
+
 
-    if x[0] == "vanilla":
-        # `VanillaCompare` interface
+@pytest.fixture(
+    params=[pytest.param("vanilla", id="vanilla")]
+    + [topology_param(topology) for topology in SAFEKEEPER_TOPOLOGIES]
+)
+# Vanilla postgres, or neon with one of the safekeeper topologies
+def pg_compare(request) -> PgCompare:
+    if request.param == "vanilla":
         fixture = request.getfixturevalue("vanilla_compare")
         assert isinstance(fixture, VanillaCompare)
-
         return fixture
-    else:
-        assert (
-            len(x) == 2
-        ), f"request param ({request.param}) should have a format of \
-        `neon_{{safekeepers_enable_fsync}}`"
-
-        # `NeonCompare` interface
-        neon_env_builder = request.getfixturevalue("neon_env_builder")
-        assert isinstance(neon_env_builder, NeonEnvBuilder)
-
-        zenbenchmark = request.getfixturevalue("zenbenchmark")
-        assert isinstance(zenbenchmark, NeonBenchmarker)
-
-        pg_bin = request.getfixturevalue("pg_bin")
-        assert isinstance(pg_bin, PgBin)
-
-        neon_env_builder.safekeepers_enable_fsync = x[1] == "on"
-
-        env = neon_env_builder.init_start()
-        env.neon_cli.create_branch("empty", ancestor_branch_name=DEFAULT_BRANCH_NAME)
 
-        branch_name = request.node.name
-        return NeonCompare(zenbenchmark, env, pg_bin, branch_name)
+    return SafekeeperNeonCompare(
+        request.getfixturevalue("zenbenchmark"),
+        request.getfixturevalue("neon_env_builder"),
+        request.getfixturevalue("pg_bin"),
+        request.node.name,
+        request.param,
+    )
 
 
 def start_heavy_write_workload(env: PgCompare, n_tables: int, scale: int, num_iters: int):
@@ -95,19 +89,22 @@ def test_heavy_write_workload(pg_compare: PgCompare, n_tables: int, scale: int,
             )
             cur.execute(f"INSERT INTO t{i} (key) VALUES (0)")
 
-    workload_thread = threading.Thread(
-        target=start_heavy_write_workload, args=(env, n_tables, scale, num_iters)
-    )
-    workload_thread.start()
+    with env.record_safekeeper_lag("safekeepers"):
+        workload_thread = threading.Thread(
+            target=start_heavy_write_workload, args=(env, n_tables, scale, num_iters)
+        )
+        workload_thread.start()
 
-    record_thread = threading.Thread(
-        target=record_lsn_write_lag, args=(env, lambda: workload_thread.is_alive())
-    )
-    record_thread.start()
+        record_thread = threading.Thread(
+            target=record_lsn_write_lag, args=(env, lambda: workload_thread.is_alive())
+        )
+        record_thread.start()
 
-    record_read_latency(env, lambda: workload_thread.is_alive(), "SELECT * from t0 where key = 0")
-    workload_thread.join()
-    record_thread.join()
+        record_read_latency(
+            env, lambda: workload_thread.is_alive(), "SELECT * from t0 where key = 0"
+        )
+        workload_thread.join()
+        record_thread.join()
 
 
 def start_pgbench_simple_update_workload(env: PgCompare, duration: int):
@@ -135,21 +132,22 @@ def test_pgbench_simple_update_workload(pg_compare: PgCompare, scale: int, durat
     env.pg_bin.run_capture(["pgbench", f"-s{scale}", "-i", env.pg.connstr()])
     env.flush()
 
-    workload_thread = threading.Thread(
-        target=start_pgbench_simple_update_workload, args=(env, duration)
-    )
-    workload_thread.start()
+    with env.record_safekeeper_lag("safekeepers"):
+        workload_thread = threading.Thread(
+            target=start_pgbench_simple_update_workload, args=(env, duration)
+        )
+        workload_thread.start()
 
-    record_thread = threading.Thread(
-        target=record_lsn_write_lag, args=(env, lambda: workload_thread.is_alive())
-    )
-    record_thread.start()
+        record_thread = threading.Thread(
+            target=record_lsn_write_lag, args=(env, lambda: workload_thread.is_alive())
+        )
+        record_thread.start()
 
-    record_read_latency(
-        env, lambda: workload_thread.is_alive(), "SELECT * from pgbench_accounts where aid = 1"
-    )
-    workload_thread.join()
-    record_thread.join()
+        record_read_latency(
+            env, lambda: workload_thread.is_alive(), "SELECT * from pgbench_accounts where aid = 1"
+        )
+        workload_thread.join()
+        record_thread.join()
 
 
 def start_pgbench_intensive_initialization(env: PgCompare, scale: int, done_event: threading.Event):
@@ -178,28 +176,31 @@ def test_pgbench_intensive_init_workload(pg_compare: PgCompare, scale: int):
 
     workload_done_event = threading.Event()
 
-    workload_thread = threading.Thread(
-        target=start_pgbench_intensive_initialization, args=(env, scale, workload_done_event)
-    )
-    workload_thread.start()
+    with env.record_safekeeper_lag("safekeepers"):
+        workload_thread = threading.Thread(
+            target=start_pgbench_intensive_initialization, args=(env, scale, workload_done_event)
+        )
+        workload_thread.start()
 
-    record_thread = threading.Thread(
-        target=record_lsn_write_lag, args=(env, lambda: not workload_done_event.is_set())
-    )
-    record_thread.start()
+        record_thread = threading.Thread(
+            target=record_lsn_write_lag, args=(env, lambda: not workload_done_event.is_set())
+        )
+        record_thread.start()
 
-    record_read_latency(env, lambda: not workload_done_event.is_set(), "SELECT count(*) from foo")
-    workload_thread.join()
-    record_thread.join()
+        record_read_latency(
+            env, lambda: not workload_done_event.is_set(), "SELECT count(*) from foo"
+        )
+        workload_thread.join()
+        record_thread.join()
 
 
 def record_lsn_write_lag(env: PgCompare, run_cond: Callable[[], bool], pool_interval: float = 1.0):
     if not isinstance(env, NeonCompare):
         return
 
-    lsn_write_lags: List[Any] = []
-    last_received_lsn = Lsn(0)
-    last_pg_flush_lsn = Lsn(0)
+    timestamps: List[float] = []
+    pg_flush_lsns = LsnArray()
+    received_lsns = LsnArray()
 
     with env.pg.connect().cursor() as cur:
         cur.execute("CREATE EXTENSION neon")
@@ -207,8 +208,7 @@ def record_lsn_write_lag(env: PgCompare, run_cond: Callable[[], bool], pool_inte
         while run_cond():
             cur.execute(
                 """
-            select pg_wal_lsn_diff(pg_current_wal_flush_lsn(),received_lsn),
-            pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_flush_lsn(),received_lsn)),
+            select pg_size_pretty(pg_wal_lsn_diff(pg_current_wal_flush_lsn(),received_lsn)),
             pg_current_wal_flush_lsn(),
             received_lsn
             from backpressure_lsns();
@@ -217,22 +217,15 @@ def record_lsn_write_lag(env: PgCompare, run_cond: Callable[[], bool], pool_inte
 
             res = cur.fetchone()
             assert isinstance(res, tuple)
-            lsn_write_lags.append(res[0])
-
-            curr_received_lsn = Lsn(res[3])
-            lsn_process_speed = (curr_received_lsn - last_received_lsn) / (1024**2)
-            last_received_lsn = curr_received_lsn
+            timestamps.append(time.time())
+            pg_flush_lsns.append(res[1])
+            received_lsns.append(res[2])
 
-            curr_pg_flush_lsn = Lsn(res[2])
-            lsn_produce_speed = (curr_pg_flush_lsn - last_pg_flush_lsn) / (1024**2)
-            last_pg_flush_lsn = curr_pg_flush_lsn
-
-            log.info(
-                f"received_lsn_lag={res[1]}, pg_flush_lsn={res[2]}, received_lsn={res[3]}, lsn_process_speed={lsn_process_speed:.2f}MB/s, lsn_produce_speed={lsn_produce_speed:.2f}MB/s"
-            )
+            log.info(f"received_lsn_lag={res[0]}, pg_flush_lsn={res[1]}, received_lsn={res[2]}")
 
             time.sleep(pool_interval)
 
+    lsn_write_lags = pg_flush_lsns - received_lsns
     env.zenbenchmark.record(
         "lsn_write_lag_max",
         float(max(lsn_write_lags) / (1024**2)),
@@ -252,11 +245,23 @@ def record_lsn_write_lag(env: PgCompare, run_cond: Callable[[], bool], pool_inte
         MetricReport.LOWER_IS_BETTER,
     )
 
+    # how fast the compute produces WAL, and how fast it gets received
+    for name, lsns in (("lsn_produce_speed", pg_flush_lsns), ("lsn_process_speed", received_lsns)):
+        speeds = lsns.rate(timestamps)
+        if speeds:
+            env.zenbenchmark.record(
+                f"{name}_avg",
+                statistics.mean(speeds) / (1024**2),
+                "MB/s",
+                MetricReport.HIGHER_IS_BETTER,
+            )
+
 
 def record_read_latency(
     env: PgCompare, run_cond: Callable[[], bool], read_query: str, read_interval: float = 1.0
 ):
     read_latencies = []
+    read_latency_histogram = LatencyHistogram()
 
     with env.pg.connect().cursor() as cur:
         while run_cond():
@@ -269,14 +274,14 @@ def record_read_latency(
                     f"Executed read query {read_query}, got {cur.fetchall()}, read time {t2-t1:.2f}s"
                 )
                 read_latencies.append(t2 - t1)
+                read_latency_histogram.record(t2 - t1)
             except Exception as err:
                 log.error(f"Got error when executing the read query: {err}")
 
             time.sleep(read_interval)
 
-    env.zenbenchmark.record(
-        "read_latency_max", max(read_latencies), "s", MetricReport.LOWER_IS_BETTER
-    )
+    # records read_latency_max along with the p50/p90/p99/p99.9 percentiles
+    env.zenbenchmark.record_histogram("read_latency", read_latency_histogram, "s")
     env.zenbenchmark.record(
         "read_latency_avg", statistics.mean(read_latencies), "s", MetricReport.LOWER_IS_BETTER
     )
@@ -0,0 +1,38 @@
+from _pytest.fixtures import FixtureRequest
+from fixtures.benchmark_fixture import NeonBenchmarker
+from fixtures.compare_fixtures import RemoteCompare
+from fixtures.neon_fixtures import NeonEnv, PageserverHttpClient, PgBin, RemotePostgres
+
+
+#
+# Check that RemoteCompare records the pageserver metrics, using a local pageserver
+# as a stand-in for a remote one: it is only reached through its HTTP API.
+#
+def test_remote_compare_pageserver_metrics(
+    neon_simple_env: NeonEnv, pg_bin: PgBin, zenbenchmark: NeonBenchmarker, request: FixtureRequest
+):
+    env = neon_simple_env
+    env.neon_cli.create_branch("test_remote_compare_pageserver_metrics", "empty")
+    pg = env.postgres.create_start("test_remote_compare_pageserver_metrics")
+
+    local_client = env.pageserver.http_client()
+    pageserver_http_client = PageserverHttpClient(
+        port=local_client.port,
+        is_testing_enabled_or_skip=lambda: None,
+        host="127.0.0.1",
+    )
+    remote_compare = RemoteCompare(
+        zenbenchmark, RemotePostgres(pg_bin, pg.connstr()), pageserver_http_client
+    )
+    assert remote_compare.tenant_id == env.initial_tenant
+
+    with remote_compare.record_pageserver_writes("pageserver_writes"):
+        remote_compare.pg.safe_psql("CREATE TABLE t AS SELECT generate_series(1, 100000) AS i")
+        remote_compare.flush()
+    remote_compare.report_peak_memory_use()
+    remote_compare.report_size()
+
+    recorded = {p["name"]: p["value"] for _, p in request.node.user_properties}
+    for name in ("pageserver_writes", "peak_mem", "size", "data_uploaded", "num_files_uploaded"):
+        assert name in recorded, f"{name} was not recorded"
+    assert recorded["size"] > 0